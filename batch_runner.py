@@ -0,0 +1,344 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import excel_to_php_converter
+import key_value_mapper
+from diff_report import REPORT_FORMATS, TEXT_EXPORTS, TEXT_REPORT
+from terminal import BOLD, RESET
+from sheet_cache import clear_cache
+from progress import QUIET, VERBOSE, set_verbosity
+from profiling import RunProfile, stage
+from sheet_engine import sheet_row_count
+from sheet_reader import FULL_READ, STREAMING_READ, open_sheet
+
+COMPARE = "compare"
+CONVERT = "convert"
+JOB_FIELDS = ("workbook", "sheet", "key_column", "value_column", "php")
+
+
+def load_manifest(manifest_path):
+    """
+    Load the list of jobs from a JSON manifest.
+
+    The manifest is either a list of jobs or an object with a "jobs" list. Each job
+    needs "workbook", "sheet", "key_column", "value_column" and "php" (the PHP file to
+    compare against, or the output file name when converting), plus an optional
+    "mode" of "compare" (default) or "convert". Compare jobs may also set "renames"
+    to propose renamed PHP keys in their report.
+
+    Args:
+        manifest_path (str): Path to the JSON manifest
+
+    Returns:
+        list: The jobs, as dictionaries
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    jobs = manifest["jobs"] if isinstance(manifest, dict) else manifest
+    for number, job in enumerate(jobs, start=1):
+        missing = [field for field in JOB_FIELDS if field not in job]
+        if missing:
+            raise ValueError(f"Job {number} in {manifest_path} is missing {missing}")
+        job.setdefault("mode", COMPARE)
+        if job["mode"] not in (COMPARE, CONVERT):
+            raise ValueError(f"Job {number} in {manifest_path} has unknown mode {job['mode']!r}")
+    check_output_paths(jobs, manifest_path)
+    return jobs
+
+
+def job_output_paths(job):
+    """
+    Output paths a job writes, which only depend on the base name of its "php" file.
+
+    Args:
+        job (dict): The job, as returned by `load_manifest`
+
+    Returns:
+        set: Normalized paths of the files and directories the job writes
+    """
+    if job["mode"] == CONVERT:
+        paths = [os.path.join("output", f"{job['php']}.php"), os.path.join("output", job["php"])]
+    else:
+        base_name = os.path.basename(job["php"]).replace(".php", "")
+        # the reports of a compare job are all named after the same base name
+        paths = [
+            os.path.join("output", f"{base_name}_modified.php"),
+            os.path.join("output", f"{base_name}_new_keys.php"),
+            os.path.join("reports", base_name),
+        ]
+    return {os.path.normcase(os.path.normpath(path)) for path in paths}
+
+
+def check_output_paths(jobs, manifest_path):
+    """
+    Reject jobs that would write the same output files, as they run concurrently.
+
+    Compare jobs against PHP files with the same base name in different directories
+    (lang/en/messages.php and lang/fr/messages.php) write the same files, so they
+    have to go in separate manifests.
+
+    Args:
+        jobs (list): The jobs of the manifest
+        manifest_path (str): Path to the JSON manifest, for the error message
+
+    Raises:
+        ValueError: If two jobs share an output path
+    """
+    owners = {}
+    for number, job in enumerate(jobs, start=1):
+        for path in job_output_paths(job):
+            if path in owners:
+                raise ValueError(
+                    f"Jobs {owners[path]} and {number} in {manifest_path} both write {path}"
+                )
+            owners[path] = number
+
+
+def run_job(
+    job,
+    read_mode=FULL_READ,
+    use_cache=True,
+    incremental=False,
+    profile=False,
+    verbosity=QUIET,
+    report_format=TEXT_REPORT,
+    text_exports=None,
+    mmap_scan=False,
+):
+    """
+    Run a single compare or convert job, capturing everything it prints.
+
+    Args:
+        job (dict): The job, as returned by `load_manifest`
+        read_mode (str): How the workbook is read, one of `sheet_reader.READ_MODES`
+        use_cache (bool): Whether the parsed-sheet cache may be used
+        incremental (bool): Whether compare jobs reuse the results of their previous run
+        profile (bool): Whether to record the time and memory of every stage
+        verbosity (int): Progress verbosity of the job, quiet by default
+        report_format (str): Report format of compare jobs, one of
+            `diff_report.REPORT_FORMATS`
+        text_exports (tuple): Text files written by compare jobs, see
+            `key_value_mapper.process_file`
+        mmap_scan (bool): Whether compare jobs scan their PHP file as memory-mapped bytes
+
+    Returns:
+        dict: The job with its "status" ("ok" or "failed"), "seconds", "result"
+        or "error", the captured "log" and, when profiled, the "profile"
+    """
+    set_verbosity(verbosity)
+    log = io.StringIO()
+    started = time.perf_counter()
+    outcome = dict(job)
+    run_profile = RunProfile(job["mode"], print_table=False) if profile else None
+    try:
+        with contextlib.redirect_stdout(log):
+            with stage(run_profile, "read_sheet") as counts:
+                sheet = open_sheet(
+                    job["workbook"], job["sheet"], read_mode, use_cache=use_cache
+                )
+                counts["rows"] = sheet_row_count(sheet)
+            if job["mode"] == CONVERT:
+                result = excel_to_php_converter.process_file(
+                    sheet,
+                    job["key_column"],
+                    job["value_column"],
+                    job["php"],
+                    profile=run_profile,
+                )
+                if result is None:
+                    raise RuntimeError(f"Could not write {job['php']}.php")
+            else:
+                result = key_value_mapper.process_file(
+                    sheet,
+                    job["key_column"],
+                    job["value_column"],
+                    job["php"],
+                    excel_file_name=job["workbook"],
+                    sheet_name=job["sheet"],
+                    incremental=incremental,
+                    profile=run_profile,
+                    report_format=report_format,
+                    text_exports=text_exports,
+                    mmap_scan=mmap_scan,
+                    detect_renames=bool(job.get("renames", False)),
+                )
+        outcome.update(status="ok", result=result)
+    except Exception as e:
+        outcome.update(status="failed", error=f"{type(e).__name__}: {e}")
+
+    outcome.update(seconds=round(time.perf_counter() - started, 3), log=log.getvalue())
+    if run_profile is not None:
+        outcome["profile"] = run_profile.as_dict()
+    return outcome
+
+
+def run_batch(
+    jobs,
+    workers=None,
+    read_mode=FULL_READ,
+    use_cache=True,
+    incremental=False,
+    profile=False,
+    verbosity=QUIET,
+    report_format=TEXT_REPORT,
+    text_exports=None,
+    mmap_scan=False,
+):
+    """
+    Run jobs in parallel on a process pool.
+
+    Args:
+        jobs (list): Jobs, as returned by `load_manifest`
+        workers (int): Number of worker processes, defaults to the number of CPUs
+        read_mode (str): How the workbooks are read, one of `sheet_reader.READ_MODES`
+        use_cache (bool): Whether the parsed-sheet cache may be used
+        incremental (bool): Whether compare jobs reuse the results of their previous run
+        profile (bool): Whether to record the time and memory of every stage of every job
+        verbosity (int): Progress verbosity of the jobs, quiet by default
+        report_format (str): Report format of compare jobs, one of
+            `diff_report.REPORT_FORMATS`
+        text_exports (tuple): Text files written by compare jobs, see
+            `key_value_mapper.process_file`
+        mmap_scan (bool): Whether compare jobs scan their PHP file as memory-mapped bytes
+
+    Yields:
+        dict: The outcome of every job, in manifest order
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                run_job,
+                job,
+                read_mode,
+                use_cache,
+                incremental,
+                profile,
+                verbosity,
+                report_format,
+                text_exports,
+                mmap_scan,
+            )
+            for job in jobs
+        ]
+        for future in futures:
+            yield future.result()
+
+
+def describe_job(outcome):
+    """Describe a job outcome in one line."""
+    target = f"{outcome['workbook']}[{outcome['sheet']}] {outcome['key_column']}/{outcome['value_column']}"
+    if outcome["status"] != "ok":
+        return f"FAILED {outcome['mode']} {target} -> {outcome['php']}: {outcome['error']}"
+    if outcome["mode"] == CONVERT:
+        return f"ok     convert {target} -> {outcome['result']} ({outcome['seconds']}s)"
+    result = outcome["result"]
+    return (
+        f"ok     compare {target} vs {outcome['php']}: "
+        f"{result['missing_in_php']} missing, {result['modified_values']} modified "
+        f"({outcome['seconds']}s)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run many compare/convert jobs from a JSON manifest in parallel."
+    )
+    parser.add_argument("manifest", help="JSON file listing the jobs to run")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="worker processes (default: CPU count)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read workbooks in streaming read-only mode",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="do not use the parsed-sheet cache"
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="empty the parsed-sheet cache before running",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only compare keys changed since the previous run of each compare job",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="record per-stage time and memory of every job in the results",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="log progress and per-key details of every job (quiet by default)",
+    )
+    parser.add_argument(
+        "--report-format",
+        choices=REPORT_FORMATS,
+        default=TEXT_REPORT,
+        help="text files only (default), or one jsonl/csv/parquet diff per compare job",
+    )
+    parser.add_argument(
+        "--text-exports",
+        nargs="*",
+        choices=TEXT_EXPORTS,
+        default=None,
+        help="text files to write (default: all for the text format, none otherwise)",
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="scan and copy the PHP files as memory-mapped bytes (for very large files)",
+    )
+    parser.add_argument(
+        "--results",
+        default=os.path.join("reports", "batch_results.json"),
+        help="where to write the per-job results (default: reports/batch_results.json)",
+    )
+    args = parser.parse_args(argv)
+
+    jobs = load_manifest(args.manifest)
+    read_mode = STREAMING_READ if args.stream else FULL_READ
+    if args.clear_cache:
+        print(f"Removed {clear_cache()} cached sheets")
+
+    outcomes = []
+    outcomes_iter = run_batch(
+        jobs,
+        args.workers,
+        read_mode,
+        not args.no_cache,
+        args.incremental,
+        args.profile,
+        VERBOSE if args.verbose else QUIET,
+        args.report_format,
+        args.text_exports,
+        args.mmap,
+    )
+    for number, outcome in enumerate(outcomes_iter, start=1):
+        print(f"[{number}/{len(jobs)}] {describe_job(outcome)}")
+        outcomes.append(outcome)
+
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    with open(args.results, "w", encoding="utf-8") as f:
+        json.dump(outcomes, f, indent=2)
+
+    failed = sum(outcome["status"] != "ok" for outcome in outcomes)
+    print(
+        f"\n{BOLD}{len(outcomes) - failed}{RESET} jobs succeeded, {BOLD}{failed}{RESET} failed"
+    )
+    print(f"Results written to {args.results}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,251 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excel_to_php_converter
+import key_value_mapper
+from comparison import find_differences
+from sheet_engine import sheet_to_mapping
+from sheet_reader import FULL_READ, STREAMING_READ, open_sheet
+
+from synthetic_data import generate_dataset
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def measure(stage, repeat, trace_memory, func, *args, **kwargs):
+    """
+    Time a stage and measure its peak Python memory.
+
+    The stage runs `repeat` times untraced and the best time is kept. It then runs
+    once more under tracemalloc to record its peak allocation, since tracing slows
+    it down too much to time it at the same time.
+
+    Args:
+        stage (str): Name of the stage
+        repeat (int): Number of timed runs
+        trace_memory (bool): Whether to do the extra traced run
+        func (callable): The stage
+
+    Returns:
+        tuple: (result of the last run, measurement dict)
+    """
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            times.append(time.perf_counter() - started)
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = func(*args, **kwargs)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result, {
+        "stage": stage,
+        "best_seconds": round(min(times), 4),
+        "mean_seconds": round(sum(times) / len(times), 4),
+        "peak_mb": None if peak is None else round(peak / 1024 / 1024, 2),
+    }
+
+
+def run_benchmarks(dataset, read_mode=FULL_READ, repeat=3, trace_memory=True):
+    """
+    Time every stage of the converter and the mapper on a dataset.
+
+    Outputs are written to a temporary working directory.
+
+    Args:
+        dataset (dict): As returned by `synthetic_data.generate_dataset`
+        read_mode (str): How the workbook is read, one of `sheet_reader.READ_MODES`
+        repeat (int): Number of timed runs of each stage
+        trace_memory (bool): Whether to measure the peak memory of each stage
+
+    Returns:
+        list: One measurement dict per stage
+    """
+    workbook = os.path.abspath(dataset["workbook"])
+    php_file = os.path.abspath(dataset["php"])
+    key_column, value_column = dataset["key_column"], dataset["value_column"]
+    base_name = os.path.basename(php_file).replace(".php", "")
+    results = []
+
+    def stage(name, func, *args, **kwargs):
+        result, measurement = measure(name, repeat, trace_memory, func, *args, **kwargs)
+        results.append(measurement)
+        return result
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            sheet = stage(
+                "read_sheet",
+                open_sheet,
+                workbook,
+                dataset["sheet"],
+                read_mode,
+                use_cache=False,
+            )
+            excel_data = stage(
+                "sheet_to_mapping", sheet_to_mapping, sheet, key_column, value_column
+            )
+            php_data = stage(
+                "extract_php_key_values", key_value_mapper.extract_php_key_values, php_file
+            )
+            php_data, php_spans = stage(
+                "index_php_file", key_value_mapper.index_php_file, php_file
+            )
+            _, php_byte_spans = stage(
+                "index_php_file_mmap", key_value_mapper.index_php_file, php_file, True
+            )
+            stage("find_differences", find_differences, excel_data, php_data)
+            stage(
+                "export_key_value_pairs",
+                key_value_mapper.export_key_value_pairs,
+                excel_data,
+                php_data,
+                base_name,
+            )
+            stage(
+                "generate_modified_php_file",
+                key_value_mapper.generate_modified_php_file,
+                php_file,
+                excel_data,
+                php_data,
+                base_name,
+                php_spans,
+            )
+            stage(
+                "generate_modified_php_file_mmap",
+                key_value_mapper.generate_modified_php_file,
+                php_file,
+                excel_data,
+                php_data,
+                base_name,
+                php_byte_spans,
+                True,
+            )
+            stage(
+                "generate_new_keys_php_file",
+                key_value_mapper.generate_new_keys_php_file,
+                excel_data,
+                php_data,
+                base_name,
+            )
+            stage(
+                "mapper.process_file",
+                key_value_mapper.process_file,
+                sheet,
+                key_column,
+                value_column,
+                php_file,
+                excel_file_name=workbook,
+                sheet_name=dataset["sheet"],
+            )
+            stage(
+                "converter.process_file",
+                excel_to_php_converter.process_file,
+                sheet,
+                key_column,
+                value_column,
+                base_name,
+            )
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def print_results(dataset, results):
+    """Print the measurements of a run as a table."""
+    print(
+        f"\n{dataset['rows']} rows, depth {dataset['depth']}, values of ~{dataset['value_length']} "
+        f"chars, {dataset['drift']:.0%} drift ({dataset['keys']} keys)"
+    )
+    print(f"{'stage':<32} {'best s':>9} {'mean s':>9} {'peak MB':>9}")
+    for result in results:
+        peak = "-" if result["peak_mb"] is None else f"{result['peak_mb']:.2f}"
+        print(
+            f"{result['stage']:<32} {result['best_seconds']:>9.4f} "
+            f"{result['mean_seconds']:>9.4f} {peak:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time each stage of the converter and mapper on synthetic data."
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 100_000],
+        help="row counts to benchmark (default: 1000 10000 100000)",
+    )
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--value-length", type=int, default=40)
+    parser.add_argument("--drift", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--stream", action="store_true", help="read the workbook in streaming mode"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip the traced peak-memory runs"
+    )
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    runs = []
+    for rows in args.rows:
+        dataset = generate_dataset(
+            args.data_dir, rows, args.depth, args.value_length, args.drift, args.seed
+        )
+        results = run_benchmarks(
+            dataset,
+            STREAMING_READ if args.stream else FULL_READ,
+            args.repeat,
+            not args.no_memory,
+        )
+        print_results(dataset, results)
+        runs.append({"dataset": dataset, "stages": results})
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\nPeak RSS of the benchmark process: {max_rss:.1f} MB")
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "streaming": args.stream,
+                    "peak_rss_mb": round(max_rss, 1),
+                    "runs": runs,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import os
+import random
+import string
+
+from openpyxl import Workbook
+
+KEY_COLUMN = "Key"
+VALUE_COLUMN = "Value"
+SHEET_NAME = "Messages"
+
+WORDS = [
+    "".join(random.Random(seed).choices(string.ascii_lowercase, k=3 + seed % 7))
+    for seed in range(512)
+]
+
+
+def _value(rng, value_length):
+    """A random sentence of roughly value_length characters."""
+    words = []
+    length = 0
+    while length < value_length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words).capitalize()
+
+
+def generate_rows(rows, depth, value_length, leaves_per_group=20, seed=0):
+    """
+    Generate the (key, value) rows of a synthetic translation sheet.
+
+    Rows come in groups: `depth` opener rows (value "[") naming the nested arrays,
+    `leaves_per_group` key-value rows, one "]" row per opener and a blank row. Both
+    the converter (which closes arrays on "]") and the mapper (which resets the key
+    prefix on a blank key) read the same nesting from it.
+
+    Args:
+        rows (int): Approximate number of rows to generate
+        depth (int): Number of nested arrays around every key, 0 for a flat sheet
+        value_length (int): Approximate length of every value
+        leaves_per_group (int): Key-value rows per group
+        seed (int): Random seed, the same arguments always give the same rows
+
+    Yields:
+        tuple: (key, value) cells, None for an empty cell
+    """
+    rng = random.Random(seed)
+    emitted = 0
+    group = 0
+    while emitted < rows:
+        for level in range(depth):
+            yield f"group_{group}_{level}", "["
+        for leaf in range(leaves_per_group):
+            yield f"key_{group}_{leaf}", _value(rng, value_length)
+        for _ in range(depth):
+            yield "]", None
+        yield None, None
+        emitted += 2 * depth + leaves_per_group + 1
+        group += 1
+
+
+def expected_mapping(rows):
+    """
+    The dot-notation key-value pairs the mapper reads from generated rows.
+
+    Args:
+        rows (iterable): Rows as yielded by `generate_rows`
+
+    Returns:
+        dict: Dot-notation keys mapped to values
+    """
+    mapping = {}
+    prefix = ""
+    for key, value in rows:
+        if key is None:
+            prefix = ""
+        elif value == "[":
+            prefix = f"{prefix}{key}."
+        elif value is not None:
+            mapping[prefix + key] = value
+    return mapping
+
+
+def write_workbook(path, rows):
+    """
+    Write generated rows to an .xlsx workbook in write-only mode.
+
+    Args:
+        path (str): Path of the workbook
+        rows (iterable): Rows as yielded by `generate_rows`
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(SHEET_NAME)
+    worksheet.append([KEY_COLUMN, VALUE_COLUMN])
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(path)
+
+
+def write_php(path, mapping, drift=0.0, seed=0):
+    """
+    Write a nested PHP language pack holding the given keys, with some drift.
+
+    A `drift` share of the keys is altered: half of them get a different value and
+    the other half are left out of the file, so they show up as modified and
+    missing keys when compared against the sheet.
+
+    Args:
+        path (str): Path of the PHP file
+        mapping (dict): Dot-notation key-value pairs, as from `expected_mapping`
+        drift (float): Share of keys to alter, between 0 and 1
+        seed (int): Random seed
+
+    Returns:
+        dict: Counts of "modified" and "missing" keys
+    """
+    rng = random.Random(seed)
+    counts = {"modified": 0, "missing": 0}
+    open_parts = []
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<?php\n\nreturn [\n")
+        for key, value in mapping.items():
+            if rng.random() < drift:
+                if rng.random() < 0.5:
+                    counts["missing"] += 1
+                    continue
+                counts["modified"] += 1
+                value = f"{value} (old)"
+
+            *parents, leaf = key.split(".")
+            shared = 0
+            while (
+                shared < min(len(parents), len(open_parts))
+                and parents[shared] == open_parts[shared]
+            ):
+                shared += 1
+            while len(open_parts) > shared:
+                open_parts.pop()
+                f.write(f"{'    ' * (len(open_parts) + 1)}],\n")
+            for part in parents[shared:]:
+                f.write(f"{'    ' * (len(open_parts) + 1)}'{part}' => [\n")
+                open_parts.append(part)
+            f.write(f"{'    ' * (len(open_parts) + 1)}'{leaf}' => '{value}',\n")
+        while open_parts:
+            open_parts.pop()
+            f.write(f"{'    ' * (len(open_parts) + 1)}],\n")
+        f.write("];\n")
+    return counts
+
+
+def generate_dataset(
+    directory,
+    rows,
+    depth=2,
+    value_length=40,
+    drift=0.05,
+    seed=0,
+    name=None,
+    overwrite=False,
+):
+    """
+    Generate a matching workbook and PHP file.
+
+    Args:
+        directory (str): Where to write the files
+        rows (int): Approximate number of sheet rows
+        depth (int): Nesting depth of the keys
+        value_length (int): Approximate length of every value
+        drift (float): Share of keys altered in the PHP file
+        seed (int): Random seed
+        name (str): Base name of the files, derived from the arguments by default
+        overwrite (bool): Write the workbook again even if it already exists. The
+            PHP file is cheap to write and always written again
+
+    Returns:
+        dict: Paths of the "workbook" and "php" files and the dataset parameters
+    """
+    os.makedirs(directory, exist_ok=True)
+    if name is None:
+        name = f"rows{rows}_depth{depth}_len{value_length}_drift{drift}_seed{seed}"
+    workbook_path = os.path.join(directory, f"{name}.xlsx")
+    php_path = os.path.join(directory, f"{name}.php")
+
+    mapping = expected_mapping(generate_rows(rows, depth, value_length, seed=seed))
+    if overwrite or not os.path.isfile(workbook_path):
+        write_workbook(workbook_path, generate_rows(rows, depth, value_length, seed=seed))
+    counts = write_php(php_path, mapping, drift, seed)
+
+    return {
+        "workbook": workbook_path,
+        "php": php_path,
+        "sheet": SHEET_NAME,
+        "key_column": KEY_COLUMN,
+        "value_column": VALUE_COLUMN,
+        "rows": rows,
+        "depth": depth,
+        "value_length": value_length,
+        "drift": drift,
+        "seed": seed,
+        "keys": len(mapping),
+        **counts,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic workbook and matching PHP language pack."
+    )
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--value-length", type=int, default=40)
+    parser.add_argument("--drift", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join("benchmarks", "data"))
+    args = parser.parse_args()
+
+    dataset = generate_dataset(
+        args.out, args.rows, args.depth, args.value_length, args.drift, args.seed
+    )
+    print(f"Workbook: {dataset['workbook']}")
+    print(f"PHP file: {dataset['php']}")
+    print(
+        f"{dataset['keys']} keys, {dataset['modified']} modified and "
+        f"{dataset['missing']} missing in the PHP file"
+    )
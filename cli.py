@@ -0,0 +1,424 @@
+import argparse
+import json
+import os
+import sys
+
+from diff_report import REPORT_FORMATS, TEXT_EXPORTS, TEXT_REPORT
+from progress import QUIET, VERBOSE, set_verbosity
+
+# Everything heavier than the standard library (pandas, numpy, openpyxl,
+# inquirer) is imported inside the command that needs it, so that --help and
+# PHP-only commands start fast.
+
+PROFILE_MODES = ("table", "json", "both")
+EXTRACT_FORMATS = ("text", "json", "jsonl")
+# same as output_formats.OUTPUT_FORMATS, which is only imported by convert
+OUTPUT_FORMAT_NAMES = ("php", "php-min", "json", "pack")
+
+
+def _add_sheet_arguments(parser, multiple_values=False):
+    parser.add_argument("workbook", help="Excel workbook to read")
+    parser.add_argument(
+        "--sheet", help="sheet to read (default: the first sheet of the workbook)"
+    )
+    parser.add_argument("--key", required=True, help="column holding the keys")
+    if multiple_values:
+        values = parser.add_mutually_exclusive_group(required=True)
+        values.add_argument("--value", help="column holding the values")
+        values.add_argument(
+            "--values",
+            nargs="+",
+            metavar="COLUMN",
+            help="columns holding the values, one PHP file each, in a single pass",
+        )
+        values.add_argument(
+            "--all-values",
+            action="store_true",
+            help="like --values, with every column except the key column",
+        )
+    else:
+        parser.add_argument("--value", required=True, help="column holding the values")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read the workbook in streaming read-only mode",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="do not use the parsed-sheet cache"
+    )
+    parser.add_argument(
+        "--profile", choices=PROFILE_MODES, help="profile every stage of the run"
+    )
+    parser.add_argument("--cprofile", metavar="STAGE", help="run a stage under cProfile")
+
+
+def _add_shard_argument(parser, output):
+    parser.add_argument(
+        "--shard-depth",
+        type=int,
+        metavar="DEPTH",
+        help=f"also write {output} as one PHP file per group at this depth "
+        "(1: every top-level key) with an index, rewriting only changed shards",
+    )
+
+
+def _add_mmap_argument(parser):
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="scan and copy the PHP file as memory-mapped bytes (for very large files)",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        metavar="N",
+        help="parse the top-level arrays of the PHP file on N processes (for very "
+        "large files, ignored with --mmap)",
+    )
+
+
+def build_parser():
+    """
+    Build the argument parser of the command line interface.
+
+    Returns:
+        argparse.ArgumentParser: The parser
+    """
+    parser = argparse.ArgumentParser(
+        prog="keyvaluemapping",
+        description="Convert Excel sheets to PHP language files and compare them.",
+    )
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument(
+        "-q", "--quiet", action="store_true", help="hide progress output"
+    )
+    verbosity.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="also log per-key details to files in reports/",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="convert a sheet to a PHP file")
+    _add_sheet_arguments(convert, multiple_values=True)
+    convert.add_argument(
+        "--output",
+        help="output file name without .php (default: the sheet name); with --values "
+        "or --all-values, a name in which {column} is replaced by every value column "
+        "(default: {column})",
+    )
+    _add_shard_argument(convert, "the output")
+    convert.add_argument(
+        "--format",
+        choices=OUTPUT_FORMAT_NAMES,
+        default="php",
+        help="indented PHP (default), single-line PHP, nested JSON or a binary "
+        "key-value pack with a sorted key table",
+    )
+
+    compare = commands.add_parser(
+        "compare", help="compare a sheet with a PHP file and write the reports"
+    )
+    _add_sheet_arguments(compare)
+    compare.add_argument("php", help="PHP file to compare against")
+    _add_mmap_argument(compare)
+    compare.add_argument(
+        "--output-workers",
+        type=int,
+        help="threads writing the reports and PHP files (default: one per file, 1 to write them in turn)",
+    )
+    _add_shard_argument(compare, "the modified PHP file")
+    compare.add_argument(
+        "--renames",
+        action="store_true",
+        help="propose renamed PHP keys for the missing keys in the report",
+    )
+    compare.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only compare keys changed since the previous run",
+    )
+    compare.add_argument(
+        "--report-format",
+        default=TEXT_REPORT,
+        choices=REPORT_FORMATS,
+        help="text files only (default), or a single jsonl/csv/parquet diff",
+    )
+    compare.add_argument(
+        "--text-exports",
+        nargs="*",
+        choices=TEXT_EXPORTS,
+        help="text files to write (default: all for the text format, none otherwise)",
+    )
+
+    watch = commands.add_parser(
+        "watch",
+        help="keep the outputs of a compare (or convert) up to date while files are edited",
+    )
+    _add_sheet_arguments(watch)
+    watch.add_argument(
+        "php",
+        help="PHP file to compare against, or the output name without .php with --convert",
+    )
+    watch.add_argument(
+        "--convert",
+        action="store_true",
+        help="regenerate the converted PHP file instead of comparing",
+    )
+    _add_mmap_argument(watch)
+    watch.add_argument(
+        "--interval",
+        type=float,
+        default=0.25,
+        help="seconds between two checks of the files (default: 0.25)",
+    )
+    watch.add_argument(
+        "--report-format",
+        default=TEXT_REPORT,
+        choices=REPORT_FORMATS,
+        help="report format of the comparison",
+    )
+    watch.add_argument(
+        "--text-exports",
+        nargs="*",
+        choices=TEXT_EXPORTS,
+        help="text files to write (default: all for the text format, none otherwise)",
+    )
+
+    extract = commands.add_parser(
+        "extract", help="print the flat key-value pairs of a PHP file"
+    )
+    extract.add_argument("php", help="PHP file to read")
+    extract.add_argument("--format", choices=EXTRACT_FORMATS, default="text")
+    extract.add_argument("--output", help="write to this file instead of stdout")
+    _add_mmap_argument(extract)
+
+    commands.add_parser(
+        "batch",
+        add_help=False,
+        help="run jobs from a JSON manifest (see 'batch --help')",
+    )
+    commands.add_parser(
+        "serve",
+        add_help=False,
+        help="serve compare/convert/lookup requests on localhost (see 'serve --help')",
+    )
+    return parser
+
+
+def _check_file(parser, path):
+    if not os.path.isfile(path):
+        parser.error(f'cannot open "{path}", check the file location or name')
+
+
+def _make_profile(args):
+    if args.profile is None and args.cprofile is None:
+        return None
+    from profiling import RunProfile
+
+    mode = args.profile or "table"
+    return RunProfile(
+        args.command,
+        print_table=mode in ("table", "both"),
+        write_json=mode in ("json", "both"),
+        cprofile_stage=args.cprofile,
+    )
+
+
+def _open_sheet(args, profile):
+    from profiling import stage
+    from sheet_engine import sheet_row_count
+    from sheet_reader import FULL_READ, STREAMING_READ, list_sheet_names, open_sheet
+
+    if args.sheet is None:
+        args.sheet = list_sheet_names(args.workbook)[0]
+    with stage(profile, "read_sheet") as counts:
+        sheet = open_sheet(
+            args.workbook,
+            args.sheet,
+            STREAMING_READ if args.stream else FULL_READ,
+            use_cache=not args.no_cache,
+        )
+        counts["rows"] = sheet_row_count(sheet)
+    for column in [args.key, *(getattr(args, "values", None) or [args.value])]:
+        if column is not None and column not in sheet.columns:
+            raise SystemExit(
+                f"error: sheet '{args.sheet}' has no column {column!r}, "
+                f"it has {list(sheet.columns)}"
+            )
+    return sheet
+
+
+def run_convert(args):
+    import excel_to_php_converter
+
+    if args.format != "php" and args.shard_depth is not None:
+        raise SystemExit("error: only the php format can be written with --shard-depth")
+    profile = _make_profile(args)
+    sheet = _open_sheet(args, profile)
+    if args.value is not None:
+        output = excel_to_php_converter.process_file(
+            sheet,
+            args.key,
+            args.value,
+            args.output or args.sheet,
+            profile=profile,
+            shard_depth=args.shard_depth,
+            output_format=args.format,
+        )
+    else:
+        value_columns = args.values or [
+            column for column in sheet.columns if column != args.key
+        ]
+        template = args.output or "{column}"
+        if len(value_columns) > 1 and "{column}" not in template:
+            raise SystemExit("error: --output must contain {column} with several value columns")
+        output = excel_to_php_converter.process_columns(
+            sheet,
+            args.key,
+            value_columns,
+            [template.replace("{column}", str(column)) for column in value_columns],
+            profile=profile,
+            shard_depth=args.shard_depth,
+            output_format=args.format,
+        )
+    if profile is not None:
+        profile.report()
+    return 0 if output is not None else 1
+
+
+def run_compare(args):
+    import key_value_mapper
+
+    profile = _make_profile(args)
+    sheet = _open_sheet(args, profile)
+    key_value_mapper.process_file(
+        sheet,
+        args.key,
+        args.value,
+        args.php,
+        excel_file_name=args.workbook,
+        sheet_name=args.sheet,
+        incremental=args.incremental,
+        profile=profile,
+        report_format=args.report_format,
+        text_exports=args.text_exports,
+        mmap_scan=args.mmap,
+        parse_workers=args.parse_workers,
+        output_workers=args.output_workers,
+        shard_depth=args.shard_depth,
+        detect_renames=args.renames,
+    )
+    if profile is not None:
+        profile.report()
+    return 0
+
+
+def run_watch(args):
+    from sheet_reader import FULL_READ, STREAMING_READ, list_sheet_names
+    from watcher import COMPARE, CONVERT, Watcher
+
+    if args.sheet is None:
+        args.sheet = list_sheet_names(args.workbook)[0]
+    watcher = Watcher(
+        args.workbook,
+        args.sheet,
+        args.key,
+        args.value,
+        args.php,
+        mode=CONVERT if args.convert else COMPARE,
+        read_mode=STREAMING_READ if args.stream else FULL_READ,
+        use_cache=not args.no_cache,
+        **(
+            {}
+            if args.convert
+            else {
+                "report_format": args.report_format,
+                "text_exports": args.text_exports,
+                "mmap_scan": args.mmap,
+                "parse_workers": args.parse_workers,
+            }
+        ),
+    )
+    watcher.run(args.interval)
+    return 0
+
+
+def run_extract(args):
+    if args.mmap:
+        from php_scanner import scan_php_file
+
+        php_data = scan_php_file(args.php, with_spans=False)[0]
+    elif args.parse_workers is not None and args.parse_workers > 1:
+        from php_parser import parse_php_parallel
+
+        with open(args.php, "r", encoding="utf-8") as f:
+            php_data = parse_php_parallel(f.read(), args.parse_workers)[0]
+    else:
+        from php_parser import parse_php_content
+
+        with open(args.php, "r", encoding="utf-8") as f:
+            php_data = parse_php_content(f.read())
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(php_data, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        elif args.format == "jsonl":
+            for key, value in php_data.items():
+                out.write(json.dumps({"key": key, "value": value}, ensure_ascii=False))
+                out.write("\n")
+        else:
+            for key, value in php_data.items():
+                out.write(f"'{key}' => '{value}'\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.output:
+        print(f"Extracted {len(php_data)} keys to {args.output}", file=sys.stderr)
+    return 0
+
+
+COMMANDS = {
+    "convert": run_convert,
+    "compare": run_compare,
+    "watch": run_watch,
+    "extract": run_extract,
+}
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+
+    parser = build_parser()
+    # batch and serve have their own options, so everything after them is handed over as is
+    global_args = []
+    while argv and argv[0] in ("-q", "--quiet", "-v", "--verbose"):
+        global_args.append(argv.pop(0))
+    if argv and argv[0] in ("batch", "serve"):
+        verbose = [] if global_args[-1:] in ([], ["-q"], ["--quiet"]) else ["--verbose"]
+        if argv[0] == "serve":
+            import translation_service
+
+            return translation_service.main(verbose + argv[1:])
+        import batch_runner
+
+        return batch_runner.main(verbose + argv[1:])
+
+    args = parser.parse_args(global_args + argv)
+    if args.quiet or args.verbose:
+        set_verbosity(QUIET if args.quiet else VERBOSE)
+    inputs = [getattr(args, "workbook", None)]
+    if not getattr(args, "convert", False):
+        # with watch --convert, "php" is the name of the output file
+        inputs.append(getattr(args, "php", None))
+    for path in inputs:
+        if path is not None:
+            _check_file(parser, path)
+    return COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
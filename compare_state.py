@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+
+STATE_DIR = os.path.join(".cache", "compare")
+
+
+def value_hash(value):
+    """
+    Short content hash of a value.
+
+    Args:
+        value (str): The value to hash
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def hash_values(data):
+    """
+    Hash every value of a key-value mapping.
+
+    Args:
+        data (dict): Key-value pairs
+
+    Returns:
+        dict: The same keys mapped to the hashes of their values
+    """
+    return {key: value_hash(value) for key, value in data.items()}
+
+
+def file_hash(file_path):
+    """
+    Hash the contents of a file.
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def changed_keys(old_hashes, new_hashes):
+    """
+    Find keys that were added, removed or whose value changed between two runs.
+
+    Args:
+        old_hashes (dict): Hashes from the previous run
+        new_hashes (dict): Hashes from this run
+
+    Returns:
+        set: The changed keys
+    """
+    changed = {key for key, digest in new_hashes.items() if old_hashes.get(key) != digest}
+    changed.update(key for key in old_hashes if key not in new_hashes)
+    return changed
+
+
+def state_path(php_file_path, key_column, value_column, excel_file_name, sheet_name):
+    """
+    Path of the state file for one comparison (workbook, sheet, columns and PHP file).
+
+    Returns:
+        str: Path of the state file (which may not exist yet)
+    """
+    identity = "\0".join(
+        str(part)
+        for part in (
+            os.path.abspath(php_file_path),
+            key_column,
+            value_column,
+            excel_file_name,
+            sheet_name,
+        )
+    )
+    name = hashlib.blake2b(identity.encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(STATE_DIR, f"{name}.json")
+
+
+def load_state(path):
+    """
+    Load the state saved by the previous run.
+
+    Args:
+        path (str): Path of the state file
+
+    Returns:
+        dict: The saved state, or None when there is none (or it cannot be read)
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(path, state):
+    """
+    Save the state of this run for the next incremental run.
+
+    Args:
+        path (str): Path of the state file
+        state (dict): Hashes and key statuses to save
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(partial, path)
@@ -0,0 +1,95 @@
+import operator
+from itertools import compress
+
+MISSING = "missing"
+MODIFIED = "modified"
+
+# Characters dropped before comparing values.
+IGNORED_CHARACTERS = ("'", '"', ".", ",")
+
+# Joins the values of a column into a single string. Never whitespace, never
+# removed, never changed by lower(), and not case-ignorable, so it keeps the
+# values apart without changing how any of them is normalized.
+SEPARATOR = "\x00"
+
+
+def normalize_values(values):
+    """
+    Normalize a column of values for comparison, like `normalize_value` on each one.
+
+    The values are joined into one string so that collapsing whitespace, dropping
+    quotes, dots and commas, and lowercasing each run once over the whole column
+    instead of once per value.
+
+    Args:
+        values (iterable): The values to normalize
+
+    Returns:
+        list: The normalized values, in the same order
+    """
+    values = list(map(str, values))
+    text = SEPARATOR.join(values)
+    if text.count(SEPARATOR) != max(len(values) - 1, 0):
+        return [normalize_value(value) for value in values]
+
+    # split() also splits around the separator, so drop the single space that
+    # join() puts on either side of it.
+    text = " ".join(text.split())
+    text = text.replace(f" {SEPARATOR}", SEPARATOR).replace(f"{SEPARATOR} ", SEPARATOR)
+    for character in IGNORED_CHARACTERS:
+        text = text.replace(character, "")
+    return text.lower().split(SEPARATOR) if values else []
+
+
+def normalize_value(value):
+    """
+    Normalize a value for more accurate comparison.
+
+    Args:
+        value (str): The value to normalize
+
+    Returns:
+        str: Normalized value
+    """
+    value = str(value)
+
+    value = " ".join(value.split())
+
+    for character in IGNORED_CHARACTERS:
+        value = value.replace(character, "")
+
+    return value.lower()
+
+
+def find_differences(excel_data, php_data, keys=None):
+    """
+    Find the keys missing in PHP and the keys whose normalized values differ.
+
+    Args:
+        excel_data (dict): Dictionary containing Excel key-value pairs
+        php_data (dict): Dictionary containing PHP key-value pairs
+        keys (iterable): The keys to look at, defaults to every Excel key. Keys not
+            in excel_data are ignored
+
+    Returns:
+        dict: MISSING or MODIFIED for every key that differs, in the order of keys
+    """
+    if keys is None:
+        keys = excel_data.keys()
+    keys = [key for key in keys if key in excel_data]
+
+    common = [key for key in keys if key in php_data]
+    differs = map(
+        operator.ne,
+        normalize_values(map(excel_data.__getitem__, common)),
+        normalize_values(map(php_data.__getitem__, common)),
+    )
+    modified = set(compress(common, differs))
+
+    statuses = {}
+    for key in keys:
+        if key not in php_data:
+            statuses[key] = MISSING
+        elif key in modified:
+            statuses[key] = MODIFIED
+    return statuses
@@ -0,0 +1,125 @@
+import csv
+import json
+import os
+
+SAME = "same"
+ONLY_IN_PHP = "only_in_php"
+
+TEXT_REPORT = "text"
+JSONL_REPORT = "jsonl"
+CSV_REPORT = "csv"
+PARQUET_REPORT = "parquet"
+NO_REPORT = "none"
+REPORT_FORMATS = [TEXT_REPORT, JSONL_REPORT, CSV_REPORT, PARQUET_REPORT, NO_REPORT]
+
+# The text files that can be written in any report format: the three key-value
+# exports of `export_key_value_pairs` and the comparison report.
+TEXT_EXPORTS = ("excel", "php", "common", "report")
+
+DIFF_COLUMNS = ("key", "excel_value", "php_value", "status")
+WRITE_BUFFER_BYTES = 1024 * 1024
+PARQUET_BATCH_ROWS = 100_000
+
+
+def iter_diff_rows(excel_data, php_data, statuses):
+    """
+    Yield one diff row per key of either side, from a single sort of all keys.
+
+    Args:
+        excel_data (dict): Dictionary containing Excel key-value pairs
+        php_data (dict): Dictionary containing PHP key-value pairs
+        statuses (dict): MISSING or MODIFIED for every Excel key that differs
+
+    Yields:
+        tuple: (key, excel_value, php_value, status) in key order, with None for
+        the value of a side that does not have the key. Status is "missing",
+        "modified", "same" or "only_in_php".
+    """
+    for key in sorted(excel_data.keys() | php_data.keys()):
+        excel_value = excel_data.get(key)
+        php_value = php_data.get(key)
+        if key not in excel_data:
+            status = ONLY_IN_PHP
+        else:
+            status = statuses.get(key, SAME)
+        yield key, excel_value, php_value, status
+
+
+def diff_report_path(key_column, value_column, base_name, report_format):
+    """
+    Path of the diff report of a comparison.
+
+    Returns:
+        str: reports/diff_<key column>_<value column>_<php name>.<format>
+    """
+    return os.path.join(
+        "reports", f"diff_{key_column}_{value_column}_{base_name}.{report_format}"
+    )
+
+
+def write_diff_report(report_file, rows, report_format):
+    """
+    Stream diff rows to a JSONL, CSV or Parquet file.
+
+    Args:
+        report_file (str): Path of the report
+        rows (iterable): Rows as yielded by `iter_diff_rows`
+        report_format (str): JSONL_REPORT, CSV_REPORT or PARQUET_REPORT
+
+    Returns:
+        int: Number of rows written
+    """
+    os.makedirs(os.path.dirname(report_file) or ".", exist_ok=True)
+    if report_format == PARQUET_REPORT:
+        return _write_parquet(report_file, rows)
+
+    count = 0
+    with open(
+        report_file, "w", encoding="utf-8", newline="", buffering=WRITE_BUFFER_BYTES
+    ) as f:
+        if report_format == JSONL_REPORT:
+            dumps = json.JSONEncoder(ensure_ascii=False).encode
+            for row in rows:
+                f.write(f"{dumps(dict(zip(DIFF_COLUMNS, row)))}\n")
+                count += 1
+        elif report_format == CSV_REPORT:
+            writer = csv.writer(f)
+            writer.writerow(DIFF_COLUMNS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            raise ValueError(f"Unknown diff report format {report_format!r}")
+    return count
+
+
+def _write_parquet(report_file, rows):
+    """Write diff rows to Parquet in batches, which needs pyarrow."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "Parquet reports need pyarrow, install it with 'pip install pyarrow' "
+            "or use the jsonl or csv report format"
+        ) from None
+
+    schema = pa.schema([(column, pa.string()) for column in DIFF_COLUMNS])
+    count = 0
+    with pq.ParquetWriter(report_file, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == PARQUET_BATCH_ROWS:
+                writer.write_batch(_record_batch(pa, schema, batch))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            writer.write_batch(_record_batch(pa, schema, batch))
+            count += len(batch)
+    return count
+
+
+def _record_batch(pa, schema, rows):
+    columns = list(zip(*rows)) if rows else [()] * len(DIFF_COLUMNS)
+    return pa.record_batch([pa.array(column, pa.string()) for column in columns], schema)
@@ -1,128 +1,239 @@
-from typing import List
-import pandas as pd
 import os
-import inquirer
+from key_store import PhpStoreBuilder
+from output_formats import OUTPUT_FORMATS, PHP_FORMAT, write_output
+from php_emitter import write_php_file, write_php_files
+from php_shards import ShardWriter, write_php_shards
+from profiling import RunProfile, profile_from_env, stage
+from sheet_engine import iter_php_chunk_columns, iter_php_chunks, sheet_row_count
+from sheet_reader import READ_MODES, STREAMING_READ, open_sheet, open_workbook
+from terminal import BOLD, ITALIC, RESET, inquire
 
 INPUT_FILE_NAME = ""
 OUTPUT_FILE_NAME = ""
-
-## formatting
-BOLD = "\033[1m"
-ITALIC = "\033[3m"
-RESET = "\033[0m"
-
-
-def inquire(message: str, choices: List) -> str:
-    """
-    Prompt the user with a list of choices and return the selected choice.
-    Args:
-        message (str): The message to display to the user.
-        choices (list): A list of choices for the user to select from.
-    Returns:
-        str: The choice selected by the user.
-    """
-    questions = [
-        inquirer.List(
-            "choice",
-            message=message + " (use ↓ ↑ to navigate)",
-            choices=choices,
-        )
-    ]
-
-    answer = inquirer.prompt(questions)
-    return answer["choice"]
-
-
-def process_file(sheet, key_column: str, value_column: str) -> None:
+ALL_OTHER_COLUMNS = "All other columns (one PHP file each)"
+
+
+def process_file(
+    sheet,
+    key_column: str,
+    value_column: str,
+    output_file_name: str = None,
+    profile: RunProfile = None,
+    shard_depth: int = None,
+    output_format: str = PHP_FORMAT,
+) -> str:
     """
     Processes an Excel sheet and converts it into a PHP array format.
     Args:
-        sheet (pandas.DataFrame): The Excel sheet to process.
+        sheet (pandas.DataFrame | StreamingSheet): The Excel sheet to process.
         key_column (str): The column name to use as keys in the PHP array.
         value_column (str): The column name to use as values in the PHP array.
+        output_file_name (str): Output file name without ".php", defaults to OUTPUT_FILE_NAME.
+        profile (RunProfile): Records the time and memory of the conversion, if given.
+        shard_depth (int): Write one PHP file per group at this depth (1 for every
+            top-level key) and an index, in a directory named after the output, see
+            `php_shards.ShardWriter`. Only shards whose contents changed are written.
+        output_format (str): One of `output_formats.OUTPUT_FORMATS`. Formats other than
+            "php" are written from the `KeyStore` of the PHP array, with their own
+            file extension, and cannot be sharded.
     Returns:
-        None
+        str: Path of the generated PHP file (or shard directory), or None if it could
+        not be written.
     The function reads the specified columns from the given Excel sheet, processes the data,
     and generates a PHP file with the array representation of the data. The output PHP file
-    is saved in the 'output' directory with a predefined name.
+    is saved in the 'output' directory with a predefined name, and is written as the rows
+    are converted rather than built in memory first.
+    """
+    if output_file_name is None:
+        output_file_name = OUTPUT_FILE_NAME
+    _check_output_format(output_format, shard_depth)
+
+    try:
+        output_dir = "output"
+        os.makedirs(output_dir, exist_ok=True)
+        if output_format != PHP_FORMAT:
+            file_name = output_file_name + OUTPUT_FORMATS[output_format][0]
+            output_file = os.path.join(output_dir, file_name)
+            with stage(profile, "write_output") as counts:
+                counts["chars"] = _write_outputs(
+                    [output_file],
+                    iter_php_chunk_columns(sheet, key_column, [value_column]),
+                    output_format,
+                )[0]
+                counts["rows"] = sheet_row_count(sheet)
+            print(f"File stored as --> {file_name}")
+            return output_file
+
+        if shard_depth is not None:
+            shard_dir = os.path.join(output_dir, output_file_name)
+            with stage(profile, "write_php_shards") as counts:
+                counts.update(
+                    write_php_shards(
+                        shard_dir,
+                        iter_php_chunks(sheet, key_column, value_column),
+                        shard_depth,
+                    )
+                )
+                counts["rows"] = sheet_row_count(sheet)
+            _print_shards(output_file_name, counts)
+            return shard_dir
+
+        output_file = os.path.join(output_dir, f"{output_file_name}.php")
+        with stage(profile, "write_php_file") as counts:
+            counts["chars"] = write_php_file(
+                output_file, iter_php_chunks(sheet, key_column, value_column)
+            )
+            counts["rows"] = sheet_row_count(sheet)
+        print(f"File stored as --> {output_file_name}.php")
+        return output_file
+    except Exception as e:
+        print(f"Expception occured: {e}")
+        return None
+
+
+def process_columns(
+    sheet,
+    key_column: str,
+    value_columns: list = None,
+    output_file_names: list = None,
+    profile: RunProfile = None,
+    shard_depth: int = None,
+    output_format: str = PHP_FORMAT,
+) -> list:
+    """
+    Converts several value columns of an Excel sheet into PHP array files in one pass.
+    Args:
+        sheet (pandas.DataFrame | StreamingSheet): The Excel sheet to process.
+        key_column (str): The column name to use as keys in the PHP arrays.
+        value_columns (list): The column names to use as values, one PHP file each.
+            Defaults to every column of the sheet except the key column.
+        output_file_names (list): Output file names without ".php", one per value
+            column. Defaults to the names of the value columns.
+        profile (RunProfile): Records the time and memory of the conversion, if given.
+        shard_depth (int): Write every value column as shards, see `process_file`.
+        output_format (str): One of `output_formats.OUTPUT_FORMATS`, see `process_file`.
+    Returns:
+        list: Paths of the generated PHP files (or shard directories), or None if they
+        could not be written.
+    The sheet is read once and the keys and nesting structure are resolved once for
+    all value columns, so converting every language of a sheet costs little more
+    than converting one of them.
     """
-    indent_level = 1
-    php_output = "<?php\n\nreturn [\n"
-
-    for index, row in sheet.iterrows():
-        key = str(row[f"{key_column}"]).strip()
-        value = str(row[f"{value_column}"]).strip()
-
-        if key == "]" or key.strip() == "]" or key == "],":
-            if indent_level > 1:
-                indent_level -= 1
-                php_output += f"{' ' * (indent_level * 4)}],\n"
-            continue
-
-        if "'" in key:
-            key = key.replace("'", "")
-        if "=>" in key:
-            key = key.split("=>")[0].strip()
-
-        if value == "nan" or not value:
-            continue
-
-        if value == "[" or value.strip() == "[":
-            php_output += f"{' ' * (indent_level * 4)}'{key}' => [\n"
-            indent_level += 1
-            continue
-
-        if value.startswith("'") and value.endswith("',"):
-            value = value[1:-2]
-        if value.startswith("'") and value.endswith("'"):
-            value = value[1:-1]
-        if value.endswith("',"):
-            value = value[:-2]
-        if value.startswith("*'"):
-            value = value[2:]
-        if value.startswith("'"):
-            value = value[1:]
-        if value.endswith(","):
-            value = value[:-1]
-
-        value = value.replace("'", "\\'")
-
-        php_output += f"{' ' * (indent_level * 4)}'{key}' => '{value}',\n"
-
-    while indent_level > 1:
-        indent_level -= 1
-        php_output += f"{' ' * (indent_level * 4)}],\n"
-
-    php_output += "];\n\nreturn $messages;\n?>"
+    if value_columns is None:
+        value_columns = [column for column in sheet.columns if column != key_column]
+    if output_file_names is None:
+        output_file_names = [str(column) for column in value_columns]
+    if len(output_file_names) != len(value_columns):
+        raise ValueError("Expected one output file name per value column")
+    _check_output_format(output_format, shard_depth)
+
     try:
         output_dir = "output"
         os.makedirs(output_dir, exist_ok=True)
-        with open(
-            os.path.join(output_dir, f"{OUTPUT_FILE_NAME}.php"), "w", encoding="utf-8"
-        ) as f:
-            f.write(php_output)
-        print(f"File stored as --> {OUTPUT_FILE_NAME}.php")
+        if output_format != PHP_FORMAT:
+            file_names = [name + OUTPUT_FORMATS[output_format][0] for name in output_file_names]
+            output_files = [os.path.join(output_dir, name) for name in file_names]
+            with stage(profile, "write_outputs") as counts:
+                counts["chars"] = sum(
+                    _write_outputs(
+                        output_files,
+                        iter_php_chunk_columns(sheet, key_column, value_columns),
+                        output_format,
+                    )
+                )
+                counts["rows"] = sheet_row_count(sheet)
+                counts["files"] = len(output_files)
+            for name in file_names:
+                print(f"File stored as --> {name}")
+            return output_files
+
+        if shard_depth is not None:
+            shard_dirs = [os.path.join(output_dir, name) for name in output_file_names]
+            with stage(profile, "write_php_shards") as counts:
+                shards = [ShardWriter(shard_dir, shard_depth) for shard_dir in shard_dirs]
+                for chunks in iter_php_chunk_columns(sheet, key_column, value_columns):
+                    for writer, chunk in zip(shards, chunks):
+                        writer.write(chunk)
+                results = [writer.close() for writer in shards]
+                for name in ("shards", "written", "removed"):
+                    counts[name] = sum(result[name] for result in results)
+                counts["rows"] = sheet_row_count(sheet)
+            for name, result in zip(output_file_names, results):
+                _print_shards(name, result)
+            return shard_dirs
+
+        output_files = [os.path.join(output_dir, f"{name}.php") for name in output_file_names]
+        with stage(profile, "write_php_files") as counts:
+            counts["chars"] = sum(
+                write_php_files(
+                    output_files, iter_php_chunk_columns(sheet, key_column, value_columns)
+                )
+            )
+            counts["rows"] = sheet_row_count(sheet)
+            counts["files"] = len(output_files)
+        for name in output_file_names:
+            print(f"File stored as --> {name}.php")
+        return output_files
     except Exception as e:
         print(f"Expception occured: {e}")
+        return None
+
+
+def _check_output_format(output_format, shard_depth):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}")
+    if shard_depth is not None and output_format != PHP_FORMAT:
+        raise ValueError("Only the php output format can be sharded")
+
+
+def _write_outputs(output_files, chunk_columns, output_format):
+    """Write the PHP sources of several files in another format, from their `KeyStore`."""
+    builders = [PhpStoreBuilder() for _ in output_files]
+    for chunks in chunk_columns:
+        for builder, chunk in zip(builders, chunks):
+            builder.write(chunk)
+    return [
+        write_output(output_file, builder.close(), output_format)
+        for output_file, builder in zip(output_files, builders)
+    ]
+
+
+def _print_shards(output_file_name, result):
+    print(
+        f"Shards stored in --> {output_file_name}/ "
+        f"({result['written']} files written, {result['removed']} removed, "
+        f"{result['shards']} groups)"
+    )
 
 
 if __name__ == "__main__":
+    import pandas as pd
+
     INPUT_FILE_NAME = input("Give your input file Name: ")
     if not os.path.isfile(INPUT_FILE_NAME):
         raise FileNotFoundError(
             f'Error opening "{INPUT_FILE_NAME}", check the file location and try again! '
         )
 
-    excel_data = pd.ExcelFile(INPUT_FILE_NAME)
+    read_mode = inquire("How should the workbook be read?", READ_MODES)
+    if read_mode == STREAMING_READ:
+        excel_data = open_workbook(INPUT_FILE_NAME)
+        sheet_names = excel_data.sheetnames
+    else:
+        excel_data = pd.ExcelFile(INPUT_FILE_NAME)
+        sheet_names = excel_data.sheet_names
 
     final_sheet = inquire(
         f"{INPUT_FILE_NAME} has following sheets, select one to proceed",
-        excel_data.sheet_names,
+        sheet_names,
     )
 
     print(f"Selected sheet: {final_sheet}")
 
-    parsed_sheet = excel_data.parse(f"{final_sheet}")
+    profile = profile_from_env("convert")
+    with stage(profile, "read_sheet") as counts:
+        parsed_sheet = open_sheet(INPUT_FILE_NAME, f"{final_sheet}", read_mode, excel_data)
+        counts["rows"] = sheet_row_count(parsed_sheet)
     key_column = inquire(
         f"'{final_sheet}' has following columns, select one as your {BOLD}KEY{RESET}",
         list(parsed_sheet.columns),
@@ -131,10 +242,14 @@ if __name__ == "__main__":
 
     value_column = inquire(
         f"'{final_sheet} has following columns, select one as your {BOLD}VALUE{RESET} - {ITALIC}except {key_column}{RESET}",
-        list(parsed_sheet.columns),
+        list(parsed_sheet.columns) + [ALL_OTHER_COLUMNS],
     )
     print(f"Selected {BOLD}Value column{RESET}: {value_column}")
 
-    OUTPUT_FILE_NAME = input("Give output file name (without .php): ")
-
-    process_file(parsed_sheet, key_column, value_column)
+    if value_column == ALL_OTHER_COLUMNS:
+        process_columns(parsed_sheet, key_column, profile=profile)
+    else:
+        OUTPUT_FILE_NAME = input("Give output file name (without .php): ")
+        process_file(parsed_sheet, key_column, value_column, profile=profile)
+    if profile is not None:
+        profile.report()
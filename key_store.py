@@ -0,0 +1,297 @@
+from collections.abc import Mapping
+
+from php_parser import unquote_php_value
+
+ROOT = 0
+_MISSING = object()
+
+# Kinds of the events of `KeyStore.walk`
+OPEN = "open"
+VALUE = "value"
+CLOSE = "close"
+
+
+class _Group:
+    """Entry of an array key in its parent table, pointing to the table of the array."""
+
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.node = node
+
+
+class KeyStore(Mapping):
+    """
+    Flat dot-notation key-value map that does not store the dotted keys.
+
+    Every array is a node with its own table of entries, indexed by node id, and
+    every key is a (parent node, leaf segment) entry in the table of its parent.
+    Segments are interned, so a segment repeated across arrays (and across the
+    locales of a pack) is stored once. Dotted strings are only built when keys are
+    iterated, from a prefix built once per array, so deep trees no longer repeat
+    their long prefixes in every key.
+
+    Assigning a key again keeps its position, as it does in PHP, and replacing an
+    array forgets everything below it. Lookups by dotted key walk the tree one
+    segment at a time. Two different paths that spell the same dotted key (a
+    segment containing the separator) are kept apart here, where a dict would
+    merge them.
+    """
+
+    def __init__(self, separator="."):
+        """
+        Args:
+            separator (str): Character separating the segments of a dotted key
+        """
+        self.separator = separator
+        self._segments = {}
+        # node id -> {segment: value or _Group}, None once the array is replaced
+        self._tables = [{}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for key, _ in self.items():
+            yield key
+
+    def __getitem__(self, key):
+        found = self._find(ROOT, key)
+        if found is None:
+            raise KeyError(key)
+        table, segment = found
+        return table[segment]
+
+    def __contains__(self, key):
+        return self._find(ROOT, key) is not None
+
+    def items(self):
+        """
+        Yield the dotted keys with their values, depth first in file order.
+
+        Returns:
+            iterator: (key, value) pairs
+        """
+        separator = self.separator
+        stack = [("", iter(self._tables[ROOT].items()))]
+        while stack:
+            prefix, entries = stack[-1]
+            for segment, value in entries:
+                if isinstance(value, _Group):
+                    stack.append(
+                        (f"{prefix}{segment}{separator}", iter(self._tables[value.node].items()))
+                    )
+                    break
+                yield prefix + segment, value
+            else:
+                stack.pop()
+
+    def values(self):
+        """
+        Returns:
+            iterator: The values, in the order of `items`
+        """
+        for _, value in self.items():
+            yield value
+
+    def walk(self):
+        """
+        Walk the tree depth first in file order, as the events of a nested writer.
+
+        Every array yields an OPEN event, the events of its entries and a CLOSE
+        event, so empty arrays are kept.
+
+        Yields:
+            tuple: (kind, depth, segment, value), with kind one of OPEN, VALUE and
+            CLOSE, depth the number of arrays open around the entry, and segment and
+            value None where they do not apply
+        """
+        stack = [iter(self._tables[ROOT].items())]
+        while stack:
+            for segment, value in stack[-1]:
+                if isinstance(value, _Group):
+                    yield OPEN, len(stack) - 1, segment, None
+                    stack.append(iter(self._tables[value.node].items()))
+                    break
+                yield VALUE, len(stack) - 1, segment, value
+            else:
+                stack.pop()
+                if stack:
+                    yield CLOSE, len(stack) - 1, None, None
+
+    def open_group(self, parent, segment):
+        """
+        Assign a new, empty array to a key, forgetting any value or array it had.
+
+        Args:
+            parent (int): Node of the array holding the key, ROOT at the top level
+            segment (str): The key inside that array
+
+        Returns:
+            int: Node of the new array
+        """
+        table = self._tables[parent]
+        segment = self._intern(segment)
+        old = table.get(segment, _MISSING)
+        if isinstance(old, _Group):
+            self._drop(old.node)
+        elif old is not _MISSING:
+            self._size -= 1
+
+        node = len(self._tables)
+        self._tables.append({})
+        table[segment] = _Group(node)
+        return node
+
+    def set(self, parent, segment, value):
+        """
+        Assign a value to a key, replacing any value or array it had.
+
+        Args:
+            parent (int): Node of the array holding the key, ROOT at the top level
+            segment (str): The key inside that array
+            value (str): The value
+        """
+        table = self._tables[parent]
+        segment = self._intern(segment)
+        old = table.get(segment, _MISSING)
+        if isinstance(old, _Group):
+            self._drop(old.node)
+            self._size += 1
+        elif old is _MISSING:
+            self._size += 1
+        table[segment] = value
+
+    @classmethod
+    def from_nested(cls, nested_dict, separator="."):
+        """
+        Build a store from nested dictionaries, without building any dotted key.
+
+        Args:
+            nested_dict (dict): The nested dictionaries
+            separator (str): Character separating the segments of a dotted key
+
+        Returns:
+            KeyStore: The flattened store
+        """
+        store = cls(separator)
+        stack = [(ROOT, iter(nested_dict.items()))]
+        while stack:
+            parent, entries = stack[-1]
+            for key, value in entries:
+                if isinstance(value, dict):
+                    stack.append((store.open_group(parent, str(key)), iter(value.items())))
+                    break
+                store.set(parent, str(key), value)
+            else:
+                stack.pop()
+        return store
+
+    def _intern(self, segment):
+        return self._segments.setdefault(segment, segment)
+
+    def _find(self, node, key):
+        """(table, segment) holding the value of a dotted key below node, or None."""
+        table = self._tables[node]
+        value = table.get(key, _MISSING)
+        if value is not _MISSING and not isinstance(value, _Group):
+            return table, key
+        # a segment may itself contain the separator, so try every split
+        split = key.find(self.separator)
+        while split != -1:
+            child = table.get(key[:split])
+            if isinstance(child, _Group):
+                found = self._find(child.node, key[split + 1 :])
+                if found is not None:
+                    return found
+            split = key.find(self.separator, split + 1)
+        return None
+
+    def _drop(self, node):
+        """Forget an array and everything below it, as PHP does when it is replaced."""
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            for value in self._tables[node].values():
+                if isinstance(value, _Group):
+                    pending.append(value.node)
+                else:
+                    self._size -= 1
+            self._tables[node] = None
+
+
+class PhpStoreBuilder:
+    """
+    Build a `KeyStore` from PHP array source fed in pieces, as it is produced.
+
+    Same line grammar and result as `php_parser.parse_php_content`, without ever
+    building the dotted keys: every "'key' => [" line opens a node, every "]" line
+    closes one and every "'key' => value" line is stored under the open node.
+    """
+
+    def __init__(self):
+        self.store = KeyStore()
+        self._nodes = [ROOT]
+        self._pending = ""
+
+    def write(self, text):
+        """
+        Feed the next piece of the PHP source, in any size.
+
+        Args:
+            text (str): The piece of source
+        """
+        lines = (self._pending + text).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        """
+        Returns:
+            KeyStore: The key-value pairs of the source
+        """
+        self._line(self._pending)
+        self._pending = ""
+        return self.store
+
+    def _line(self, raw_line):
+        line = raw_line.strip()
+        if not line:
+            return
+
+        first = line[0]
+        if first == "]":
+            if (line == "]" or line == "],") and len(self._nodes) > 1:
+                self._nodes.pop()
+            return
+        if first != "'" and first != '"':
+            return
+
+        parts = line.split("=>")
+        if len(parts) != 2:
+            return
+
+        key, value = parts
+        segment = key.rstrip().strip("'\" ")
+        value = value.strip()
+        if value.endswith("["):
+            self._nodes.append(self.store.open_group(self._nodes[-1], segment))
+        else:
+            self.store.set(self._nodes[-1], segment, unquote_php_value(value))
+
+
+def parse_php_to_store(php_content):
+    """
+    Parse the contents of a PHP array file into a `KeyStore`, see `PhpStoreBuilder`.
+
+    Args:
+        php_content (str): Contents of the PHP file.
+
+    Returns:
+        KeyStore: The key-value pairs of the file.
+    """
+    builder = PhpStoreBuilder()
+    builder.write(php_content)
+    return builder.close()
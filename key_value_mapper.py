@@ -1,311 +1,351 @@
+import contextlib
+import functools
+import itertools
 import os
-import pandas as pd
-from excel_to_php_converter import inquire, BOLD, ITALIC, RESET
+from datetime import datetime
+from comparison import MISSING, MODIFIED, find_differences
+from compare_state import (
+    changed_keys,
+    file_hash,
+    hash_values,
+    load_state,
+    save_state,
+    state_path,
+)
+from diff_report import (
+    CSV_REPORT,
+    JSONL_REPORT,
+    PARQUET_REPORT,
+    REPORT_FORMATS,
+    TEXT_EXPORTS,
+    TEXT_REPORT,
+    diff_report_path,
+    iter_diff_rows,
+    write_diff_report,
+)
+from key_store import parse_php_to_store
+from php_emitter import PHP_HEADER, close_line, entry_line, open_line, write_php_file
+from php_parser import index_php_content, parse_php_content, parse_php_parallel
+from php_shards import INDEX_FILE, write_php_shards
+from output_stage import run_writers
+from php_scanner import rewrite_php_file, scan_php_file
+from progress import Progress
+from profiling import profile_from_env, stage
+from rename_detection import find_renames
+from sheet_engine import sheet_row_count, sheet_to_mapping
+from sheet_reader import READ_MODES, STREAMING_READ, open_sheet, open_workbook
+from terminal import inquire, BOLD, ITALIC, RESET
 
 INPUT_EXCEL_FILE = ""
 INPUT_PHP_FILE = ""
 
-
-def generate_modified_php_file(php_file_path, excel_data, php_data, base_name):
+FULL_COMPARISON = "Full (compare every key again)"
+INCREMENTAL_COMPARISON = "Incremental (only keys changed since the last run)"
+COMPARISON_MODES = [FULL_COMPARISON, INCREMENTAL_COMPARISON]
+
+TEXT_SCAN = "Text (decode the whole PHP file)"
+MMAP_SCAN = "Memory-mapped (scan the bytes in place, for very large files)"
+PHP_SCAN_MODES = [TEXT_SCAN, MMAP_SCAN]
+
+EXPORT_SECTIONS = ("excel", "php", "common")
+EXPORT_FILE_SUFFIXES = {
+    "excel": "excel_pairs.txt",
+    "php": "php_pairs.txt",
+    "common": "potential_modified.txt",
+}
+EXPORT_BUFFER_BYTES = 1024 * 1024
+
+
+def generate_modified_php_file(
+    php_file_path,
+    excel_data,
+    php_data,
+    base_name,
+    php_spans=None,
+    mmap_scan=False,
+    shard_depth=None,
+):
     """
     Generate a PHP file with the same structure as the input PHP file but with values updated
     according to the Excel sheet for matching keys.
 
+    Only the value literals of matching keys are rewritten, everything else is copied
+    through unchanged. Progress is reported as a whole; the old and new value of every
+    updated key are only logged to reports/<base_name>_updated_keys.log in verbose mode.
+
     Args:
         php_file_path (str): Path to the original PHP file
         excel_data (dict): Dictionary containing Excel key-value pairs
         php_data (dict): Dictionary containing PHP key-value pairs
         base_name (str): Base name for the output file
+        php_spans (dict): Value spans from `index_php_file`, the file is indexed
+            again when not given
+        mmap_scan (bool): Copy the file from a memory map instead of decoding it. The
+            spans must then be byte offsets, as given by `index_php_file` in that mode
+        shard_depth (int): Also split the modified file into one file per group at
+            this depth and an index, in output/<base_name>_modified/, see
+            `php_shards.ShardWriter`. Only shards whose contents changed are written
+
+    Returns:
+        dict: Shard counts of `php_shards.write_php_shards`, None without shard_depth
     """
     output_dir = "output"
     os.makedirs(output_dir, exist_ok=True)
     output_file = os.path.join(output_dir, f"{base_name}_modified.php")
 
-    with open(php_file_path, "r", encoding="utf-8") as f:
-        php_content = f.readlines()
-
-    modified_content = []
-    nesting_stack = []
-    current_path = []
-
-    for line in php_content:
-        modified_line = line
-        line_strip = line.strip()
-
-        if (
-            "[" in line_strip
-            and "=>" in line_strip
-            and not line_strip.endswith(";")
-            and "'" not in line_strip.split("=>")[1].strip()
-        ):
-            if line_strip.startswith("'") or line_strip.startswith('"'):
-                parts = line_strip.split("=>")
-                if len(parts) == 2:
-                    key = parts[0].strip().strip("'\" ")
-                    if current_path:
-                        current_path.append(key)
-                    else:
-                        current_path = [key]
-                    nesting_stack.append(key)
-
-        elif line_strip == "]," or line_strip == "]":
-            if current_path:
-                current_path.pop()
-
-        elif "=>" in line_strip and (
-            line_strip.startswith("'") or line_strip.startswith('"')
-        ):
-            parts = line_strip.split("=>")
-            if len(parts) == 2:
-                key_part = parts[0].strip()
-                key = key_part.strip("'\" ")
-
-                if current_path:
-                    full_key = ".".join(current_path + [key])
-                else:
-                    full_key = key
-
-                if full_key in excel_data:
-                    excel_value = excel_data[full_key]
-
-                    value_part = parts[1].strip()
-
-                    has_trailing_comma = value_part.endswith(",")
-
-                    if "'" in value_part:
-                        if has_trailing_comma:
-                            modified_value = f"'{excel_value}',"
-                        else:
-                            modified_value = f"'{excel_value}'"
-                    elif '"' in value_part:
-                        if has_trailing_comma:
-                            modified_value = f'"{excel_value}",'
-                        else:
-                            modified_value = f'"{excel_value}"'
-                    else:
-                        if has_trailing_comma:
-                            modified_value = f"{excel_value},"
-                        else:
-                            modified_value = excel_value
-
-                    modified_line = f"{key_part} => {modified_value}"
-
-                    indent = line[: line.find(line.lstrip())]
-                    modified_line = f"{indent}{modified_line}\n"
-
-                    print(
-                        f"Updating key: {full_key}, Old value: {value_part[:10]}, New value: {modified_value[:10]} -- stripped"
-                    )
+    if mmap_scan:
+        if php_spans is None:
+            _, php_spans = scan_php_file(php_file_path)
+    else:
+        with open(php_file_path, "r", encoding="utf-8") as f:
+            php_content = f.read()
+        if php_spans is None:
+            _, php_spans = index_php_content(php_content)
+
+    patches = sorted(
+        (php_spans[key][1], php_spans[key][2], key)
+        for key in excel_data
+        if key in php_spans
+    )
 
-        modified_content.append(modified_line)
+    detail_file = os.path.join("reports", f"{base_name}_updated_keys.log")
+    with Progress("Updating keys", len(patches), detail_file) as progress:
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.writelines(modified_content)
+        def replace(key, old_literal):
+            new_literal = format_php_literal(old_literal, excel_data[key])
+            progress.advance()
+            if progress.details:
+                progress.detail(
+                    f"Updating key: {key}, Old value: {old_literal}, New value: {new_literal}"
+                )
+            return new_literal
+
+        if mmap_scan:
+            rewrite_php_file(php_file_path, output_file, patches, replace)
+        else:
+            with open(output_file, "w", encoding="utf-8") as f:
+                position = 0
+                for start, end, key in patches:
+                    f.write(php_content[position:start])
+                    f.write(replace(key, php_content[start:end]))
+                    position = end
+                f.write(php_content[position:])
 
     print(f"Generated modified PHP file: {output_file}")
     print(
         f"Updated {BOLD}{len([k for k in excel_data.keys() if k in php_data])}{RESET} key-value pairs"
     )
 
+    if shard_depth is None:
+        return None
+    shard_dir = os.path.join(output_dir, f"{base_name}_modified")
+    with open(output_file, "r", encoding="utf-8") as f:
+        shards = write_php_shards(shard_dir, f, shard_depth)
+    print(
+        f"Split into {shards['shards']} shards in {shard_dir} "
+        f"({shards['written']} files written, {shards['removed']} removed)"
+    )
+    return shards
 
-def generate_new_keys_php_file(excel_data, php_data, base_name):
+
+def format_php_literal(old_literal, value):
     """
-    Generate a PHP file with the key-value pairs that exist in the Excel sheet but not in the PHP file.
+    Format a new value in the same quoting style as the literal it replaces.
 
     Args:
-        excel_data (dict): Dictionary containing Excel key-value pairs
-        php_data (dict): Dictionary containing PHP key-value pairs
-        base_name (str): Base name for the output file
+        old_literal (str): The value literal found in the PHP file
+        value (str): The new value
+
+    Returns:
+        str: The new value literal
     """
-    output_dir = "output"
-    os.makedirs(output_dir, exist_ok=True)
-    output_file = os.path.join(output_dir, f"{base_name}_new_keys.php")
+    if "'" in old_literal:
+        return f"'{value}'"
+    if '"' in old_literal:
+        return f'"{value}"'
+    return value
 
-    missing_keys = {k: v for k, v in excel_data.items() if k not in php_data}
 
-    grouped_keys = {}
-    for key, value in missing_keys.items():
-        parts = key.split(".")
+def build_key_trie(pairs):
+    """
+    Build a prefix trie of dot-notation keys.
 
-        if len(parts) > 1:
-            parent_key = ".".join(parts[:-1])
-            child_key = parts[-1]
+    Every node maps a key part to its child node. The value of a key is stored in
+    its node under None, since key parts are always strings.
 
-            if parent_key not in grouped_keys:
-                grouped_keys[parent_key] = {}
+    Args:
+        pairs (dict): Dot-notation key-value pairs
+
+    Returns:
+        dict: The root node
+    """
+    root = {}
+    for key, value in pairs.items():
+        node = root
+        for part in key.split("."):
+            node = node.setdefault(part, {})
+        node[None] = value
+    return root
 
-            grouped_keys[parent_key][child_key] = value
-        else:
-            if "root" not in grouped_keys:
-                grouped_keys["root"] = {}
-            grouped_keys["root"][key] = value
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write("<?php\n\nreturn [\n")
+def _iter_trie_lines(root):
+    """
+    Yield the PHP lines of a key trie, opening every shared parent array once.
 
-        if "root" in grouped_keys:
-            for key, value in grouped_keys["root"].items():
-                f.write(f"    '{key}' => '{value}',\n")
+    The trie is walked depth-first with an explicit stack, so each node is
+    visited exactly once whatever the depth of the keys.
+
+    Args:
+        root (dict): The root node, as returned by `build_key_trie`
+
+    Yields:
+        str: Consecutive lines of the PHP array body
+    """
+    stack = [iter(root.items())]
+    while stack:
+        depth = len(stack) - 1
+        for part, node in stack[-1]:
+            if part is None:
+                continue
+            if None in node:
+                yield entry_line(part, node[None], depth)
+            if len(node) > (None in node):
+                yield open_line(part, depth)
+                stack.append(iter(node.items()))
+                break
+        else:
+            stack.pop()
+            if stack:
+                yield close_line(depth - 1)
 
-        for parent_key, children in grouped_keys.items():
-            if parent_key != "root":
-                parent_parts = parent_key.split(".")
 
-                indent = "    "
-                f.write(f"{indent}'{parent_parts[0]}' => [\n")
-                indent += "    "
+def generate_new_keys_php_file(excel_data, php_data, base_name):
+    """
+    Generate a PHP file with the key-value pairs that exist in the Excel sheet but not in the PHP file.
 
-                for i in range(1, len(parent_parts)):
-                    f.write(f"{indent}'{parent_parts[i]}' => [\n")
-                    indent += "    "
+    The missing keys are built into a prefix trie, so keys sharing parent arrays are
+    written under a single opening of each array.
 
-                for key, value in children.items():
-                    f.write(f"{indent}'{key}' => '{value}',\n")
+    Args:
+        excel_data (dict): Dictionary containing Excel key-value pairs
+        php_data (dict): Dictionary containing PHP key-value pairs
+        base_name (str): Base name for the output file
+    """
+    output_dir = "output"
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{base_name}_new_keys.php")
 
-                for i in range(len(parent_parts)):
-                    indent = indent[:-4]
-                    f.write(f"{indent}],\n")
+    missing_keys = {k: v for k, v in excel_data.items() if k not in php_data}
 
-        f.write("];\n")
+    write_php_file(
+        output_file,
+        itertools.chain(
+            (PHP_HEADER,), _iter_trie_lines(build_key_trie(missing_keys)), ("];\n",)
+        ),
+    )
 
     print(f"Generated new keys PHP file: {output_file}")
 
 
-def export_key_value_pairs(excel_data, php_data, base_name):
+def export_key_value_pairs(excel_data, php_data, base_name, sections=EXPORT_SECTIONS):
     """
     Export key-value pairs from both data sources to text files for manual comparison.
 
+    All keys are sorted once and the selected files are written side by side in a
+    single pass over them.
+
     Args:
         excel_data (dict): Dictionary containing Excel key-value pairs
         php_data (dict): Dictionary containing PHP key-value pairs
         base_name (str): Base name for the output files
+        sections (tuple): Which files to write, any of "excel", "php" and "common"
     """
     output_dir = "reports"
     os.makedirs(output_dir, exist_ok=True)
-
-    excel_file = os.path.join(output_dir, f"{base_name}_excel_pairs.txt")
-    with open(excel_file, "w", encoding="utf-8") as f:
-        f.write("Excel Key-Value Pairs\n")
-        f.write("=" * 60 + "\n\n")
-
-        for key in sorted(excel_data.keys()):
-            value = excel_data[key]
-            f.write(f"'{key}' => '{value}'\n")
-
-    php_file = os.path.join(output_dir, f"{base_name}_php_pairs.txt")
-    with open(php_file, "w", encoding="utf-8") as f:
-        f.write("PHP Key-Value Pairs\n")
-        f.write("=" * 60 + "\n\n")
-
-        for key in sorted(php_data.keys()):
-            value = php_data[key]
-            f.write(f"'{key}' => '{value}'\n")
-
-    modified_file = os.path.join(output_dir, f"{base_name}_potential_modified.txt")
-    with open(modified_file, "w", encoding="utf-8") as f:
-        f.write("Potential Modified Values (Keys in both files)\n")
-        f.write("=" * 60 + "\n\n")
-
-        common_keys = set(excel_data.keys()) & set(php_data.keys())
-
-        for key in sorted(common_keys):
-            excel_value = excel_data[key]
-            php_value = php_data[key]
-            f.write(f"Key: '{key}'\n")
-            f.write(f"  Excel: '{excel_value}'\n")
-            f.write(f"  PHP:   '{php_value}'\n")
-            f.write(f"  Same?  {excel_value == php_value}\n")
-            f.write("\n")
+    titles = {
+        "excel": "Excel Key-Value Pairs",
+        "php": "PHP Key-Value Pairs",
+        "common": "Potential Modified Values (Keys in both files)",
+    }
+    labels = {
+        "excel": "Excel pairs",
+        "php": "PHP pairs",
+        "common": "Potential modified values",
+    }
+    sections = [section for section in EXPORT_SECTIONS if section in sections]
+    paths = {
+        section: os.path.join(output_dir, f"{base_name}_{EXPORT_FILE_SUFFIXES[section]}")
+        for section in sections
+    }
+
+    with contextlib.ExitStack() as stack:
+        files = {
+            section: stack.enter_context(
+                open(path, "w", encoding="utf-8", buffering=EXPORT_BUFFER_BYTES)
+            )
+            for section, path in paths.items()
+        }
+        for section, f in files.items():
+            f.write(f"{titles[section]}\n")
+            f.write("=" * 60 + "\n\n")
+
+        excel_file = files.get("excel")
+        php_file = files.get("php")
+        common_file = files.get("common")
+        for key in sorted(excel_data.keys() | php_data.keys()) if files else ():
+            in_excel = key in excel_data
+            in_php = key in php_data
+            if in_excel and excel_file is not None:
+                excel_file.write(f"'{key}' => '{excel_data[key]}'\n")
+            if in_php and php_file is not None:
+                php_file.write(f"'{key}' => '{php_data[key]}'\n")
+            if in_excel and in_php and common_file is not None:
+                excel_value = excel_data[key]
+                php_value = php_data[key]
+                common_file.write(
+                    f"Key: '{key}'\n"
+                    f"  Excel: '{excel_value}'\n"
+                    f"  PHP:   '{php_value}'\n"
+                    f"  Same?  {excel_value == php_value}\n"
+                    "\n"
+                )
 
     print(
         f"\nExported key-value pairs to {ITALIC}'{output_dir}'{RESET} directory for manual comparison"
     )
-    print(f"- Excel pairs: {excel_file}")
-    print(f"- PHP pairs: {php_file}")
-    print(f"- Potential modified values: {modified_file}")
-
-
-def process_file(sheet, key_column, value_column, php_file_path):
+    for section, path in paths.items():
+        print(f"- {labels[section]}: {path}")
+
+
+def write_comparison_report(
+    report_file,
+    excel_file_name,
+    sheet_name,
+    php_file_path,
+    missing_in_php,
+    modified_values,
+    renames=None,
+):
     """
-    Compare key-value pairs between an Excel sheet and a PHP file.
-    Generate a report of differences focusing on keys missing in PHP and modified values.
+    Write the comparison report listing missing keys and modified values.
 
     Args:
-        sheet (pandas.DataFrame): The Excel sheet containing data
-        key_column (str): The column name to use as keys
-        value_column (str): The column name to use as values
-        php_file_path (str): Path to the PHP file for comparison
+        report_file (str): Path of the report
+        excel_file_name (str): Workbook name shown in the report
+        sheet_name (str): Sheet name shown in the report
+        php_file_path (str): Path to the PHP file shown in the report
+        missing_in_php (list): (key, excel_value) of keys missing in PHP
+        modified_values (list): (key, excel_value, php_value) of modified keys
+        renames (dict): Proposed renames of missing keys from
+            `rename_detection.find_renames`, written as a third section if given
     """
-    excel_data = {}
-    current_path = []
-
-    debug_nested_keys = []
-
-    for index, row in sheet.iterrows():
-        key = str(row[key_column]).strip()
-        value = str(row[value_column]).strip()
-
-        if not key or key == "nan" or key == "":
-            current_path = []
-            continue
-
-        if "'" in key:
-            key = key.replace("'", "")
-        if "=>" in key:
-            key = key.split("=>")[0].strip()
-
-        if value == "[" or value.strip() == "[":
-            current_path.append(key)
-            debug_nested_keys.append(".".join(current_path))
-            continue
-
-        if (value == "nan" or not value or value == "") and value != "[":
-            continue
-
-        value = clean_value(value)
-
-        if current_path:
-            full_key = ".".join(current_path + [key])
-        else:
-            full_key = key
-
-        excel_data[full_key] = value
-
-    print(f"\nExtracted {ITALIC}{len(excel_data)}{RESET} keys from Excel sheet")
-    # print(f"Detected {len(debug_nested_keys)} nested keys: {debug_nested_keys[:5]}...") # no need
-
-    php_data = extract_php_key_values(php_file_path)
-    print(f"Extracted {ITALIC}{len(php_data)}{RESET} keys from PHP file")
-
-    base_name = os.path.basename(php_file_path).replace(".php", "")
-    export_key_value_pairs(excel_data, php_data, base_name)
-
-    missing_in_php = []
-    modified_values = []
-
-    for key, excel_value in excel_data.items():
-        if key not in php_data:
-            missing_in_php.append((key, excel_value))
-        else:
-            php_value = php_data[key]
-            excel_value_norm = normalize_value(excel_value)
-            php_value_norm = normalize_value(php_value)
-
-            if excel_value_norm != php_value_norm:
-                modified_values.append((key, excel_value, php_value))
-
-    output_dir = "reports"
-    os.makedirs(output_dir, exist_ok=True)
-    report_file = os.path.join(
-        output_dir,
-        f"comparison_report_{key_column}_{value_column}_{os.path.basename(php_file_path).replace('.php', '')}.txt",
-    )
+    os.makedirs(os.path.dirname(report_file), exist_ok=True)
 
     with open(report_file, "w", encoding="utf-8") as f:
         f.write("Comparison Report: Excel vs PHP File\n")
-        f.write(f"Excel File: {INPUT_EXCEL_FILE}, Sheet: {final_sheet}\n")
+        f.write(f"Excel File: {excel_file_name}, Sheet: {sheet_name}\n")
         f.write(f"PHP File: {php_file_path}\n")
-        f.write(f"Date: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
         f.write("=" * 60 + "\n\n")
 
         f.write(f"1. Keys in Excel but missing in PHP ({len(missing_in_php)})\n")
@@ -322,181 +362,411 @@ def process_file(sheet, key_column, value_column, php_file_path):
             f.write(f"  PHP value:   '{php_value}'\n")
             f.write("\n")
 
-    print(f"Comparison report generated: {report_file}")
-
-    print("\nSUMMARY:")
-    print(f"- Keys in Excel but missing in PHP: {BOLD}{len(missing_in_php)}{RESET}")
-    print(f"- Keys with modified values: {BOLD}{len(modified_values)}{RESET}")
-
-    base_name = os.path.basename(php_file_path).replace(".php", "")
-
-    generate_modified_php_file(php_file_path, excel_data, php_data, base_name)
+        if renames is not None:
+            f.write(f"3. Missing keys that may be renamed PHP keys ({len(renames)})\n")
+            f.write("-" * 60 + "\n")
+            for key, value in missing_in_php:
+                if key not in renames:
+                    continue
+                f.write(f"Key: '{key}' => '{value}'\n")
+                for php_key, php_value, similarity, value_similarity in renames[key]:
+                    f.write(
+                        f"  maybe '{php_key}' => '{php_value}' "
+                        f"(similarity {similarity:.2f}, value similarity {value_similarity:.2f})\n"
+                    )
+                f.write("\n")
 
-    generate_new_keys_php_file(excel_data, php_data, base_name)
+    print(f"Comparison report generated: {report_file}")
 
 
-def normalize_value(value):
+def process_file(
+    sheet,
+    key_column,
+    value_column,
+    php_file_path,
+    excel_file_name=None,
+    sheet_name=None,
+    incremental=False,
+    profile=None,
+    report_format=TEXT_REPORT,
+    text_exports=None,
+    excel_data=None,
+    php_index=None,
+    mmap_scan=False,
+    output_workers=None,
+    shard_depth=None,
+    detect_renames=False,
+    parse_workers=None,
+):
     """
-    Normalize a value for more accurate comparison.
+    Compare key-value pairs between an Excel sheet and a PHP file.
+    Generate a report of differences focusing on keys missing in PHP and modified values.
+
+    In incremental mode the value hashes and key statuses of the previous run are kept
+    in a state file. Only keys whose value changed on either side are compared again,
+    and only the reports and PHP files affected by a change, or changed on disk since
+    the last run, are written again.
 
     Args:
-        value (str): The value to normalize
+        sheet (pandas.DataFrame | StreamingSheet): The Excel sheet containing data
+        key_column (str): The column name to use as keys
+        value_column (str): The column name to use as values
+        php_file_path (str): Path to the PHP file for comparison
+        excel_file_name (str): Workbook name shown in the report, defaults to INPUT_EXCEL_FILE
+        sheet_name (str): Sheet name shown in the report
+        incremental (bool): Reuse the results of the previous run where nothing changed
+        profile (profiling.RunProfile): Records the time and memory of every stage, if given
+        report_format (str): One of `diff_report.REPORT_FORMATS`. "text" writes the text
+            files only, "jsonl", "csv" and "parquet" also write a single diff file with
+            the key, both values and the status of every key, "none" writes no diff file
+        text_exports (tuple): Which text files to write, any of "excel", "php", "common"
+            and "report". Defaults to all of them for the "text" format, none otherwise
+        excel_data (dict): Mapping of the sheet from an earlier `sheet_to_mapping`, to
+            skip building it again
+        php_index (tuple): (php_data, php_spans) of the PHP file from an earlier
+            `index_php_file`, to skip parsing it again
+        mmap_scan (bool): Scan and copy the PHP file as memory-mapped bytes instead of
+            decoding it, for very large files. A given php_index must come from
+            `index_php_file` in the same mode
+        output_workers (int): Threads writing the reports and PHP files concurrently,
+            one per file by default, 1 to write them one after another
+        shard_depth (int): Also split the modified PHP file into one file per group
+            at this depth, see `generate_modified_php_file`
+        detect_renames (bool): Propose, in a third section of the text report, the
+            PHP keys missing from the sheet that missing keys may have been renamed
+            or moved from, see `rename_detection.find_renames`
+        parse_workers (int): Processes parsing the PHP file, see `index_php_file`
 
     Returns:
-        str: Normalized value
+        dict: Summary of the run (key counts, missing/modified/changed counts, the
+        number of missing keys with proposed renames, and the paths of the text report
+        and the diff file, None when not written)
     """
-    value = str(value)
+    if excel_file_name is None:
+        excel_file_name = INPUT_EXCEL_FILE
+    if text_exports is None:
+        text_exports = TEXT_EXPORTS if report_format == TEXT_REPORT else ()
 
-    value = " ".join(value.split())
+    if excel_data is None:
+        with stage(profile, "sheet_to_mapping") as counts:
+            excel_data = sheet_to_mapping(sheet, key_column, value_column)
+            counts.update(rows=sheet_row_count(sheet), keys=len(excel_data))
 
-    value = value.replace("'", "").replace('"', "")
+    print(f"\nExtracted {ITALIC}{len(excel_data)}{RESET} keys from Excel sheet")
 
-    value = value.replace(".", "").replace(",", "")
+    if php_index is None:
+        with stage(profile, "index_php_file") as counts:
+            php_index = index_php_file(php_file_path, mmap_scan, parse_workers)
+            counts.update(keys=len(php_index[0]))
+    php_data, php_spans = php_index
+    print(f"Extracted {ITALIC}{len(php_data)}{RESET} keys from PHP file")
 
-    value = value.lower()
+    base_name = os.path.basename(php_file_path).replace(".php", "")
+    report_file = os.path.join(
+        "reports",
+        f"comparison_report_{key_column}_{value_column}_{os.path.basename(php_file_path).replace('.php', '')}.txt",
+    )
 
-    return value
+    state_file = state = None
+    if incremental:
+        with stage(profile, "load_state"):
+            state_file = state_path(
+                php_file_path, key_column, value_column, excel_file_name, sheet_name
+            )
+            state = load_state(state_file)
+            excel_hashes = hash_values(excel_data)
+            php_hashes = hash_values(php_data)
+            php_file_digest = file_hash(php_file_path)
+
+    with stage(profile, "find_differences") as counts:
+        if state is None:
+            old_statuses = {}
+            statuses = find_differences(excel_data, php_data)
+            changed_excel = set(excel_data)
+            changed_php = set(php_data)
+            php_file_changed = True
+        else:
+            old_statuses = state["status"]
+            changed_excel = changed_keys(state["excel"], excel_hashes)
+            changed_php = changed_keys(state["php"], php_hashes)
+            statuses = {
+                key: status
+                for key, status in old_statuses.items()
+                if key not in changed_excel and key not in changed_php
+            }
+            statuses.update(
+                find_differences(excel_data, php_data, changed_excel | changed_php)
+            )
+            php_file_changed = state["php_file"] != php_file_digest
+            print(
+                f"Incremental run: {BOLD}{len(changed_excel | changed_php)}{RESET} keys changed since the last run"
+            )
+        changed = changed_excel | changed_php
+
+        missing_in_php = [
+            (key, value)
+            for key, value in excel_data.items()
+            if statuses.get(key) == MISSING
+        ]
+        modified_values = [
+            (key, value, php_data[key])
+            for key, value in excel_data.items()
+            if statuses.get(key) == MODIFIED
+        ]
+        counts.update(keys=len(changed), differences=len(statuses))
+
+    # Outputs are named after the PHP file only, so another comparison against a PHP
+    # file with the same name may have overwritten them since the last run.
+    output_digests = {} if state is None else state.get("outputs", {})
+    output_files = []
+
+    def needs_update(output_file, stale):
+        output_files.append(output_file)
+        return (
+            state is None
+            or stale
+            or not os.path.isfile(output_file)
+            or output_digests.get(output_file) != file_hash(output_file)
+        )
 
+    # The outputs are independent of each other, so they are written concurrently.
+    writers = []
+    export_sections = [
+        section
+        for section, stale in (
+            ("excel", bool(changed_excel)),
+            ("php", bool(changed_php)),
+            ("common", bool(changed)),
+        )
+        if section in text_exports
+        and needs_update(
+            os.path.join("reports", f"{base_name}_{EXPORT_FILE_SUFFIXES[section]}"), stale
+        )
+    ]
+    if export_sections:
+        writers.append(
+            (
+                "export_key_value_pairs",
+                functools.partial(
+                    export_key_value_pairs, excel_data, php_data, base_name, export_sections
+                ),
+                {"keys": len(excel_data) + len(php_data)},
+            )
+        )
 
-def clean_value(value):
-    """Helper function to clean up value strings"""
-    if value.startswith("'") and value.endswith("',"):
-        value = value[1:-2]
-    elif value.startswith("'") and value.endswith("'"):
-        value = value[1:-1]
-    elif value.endswith("',"):
-        value = value[:-2]
-    elif value.startswith("*'"):
-        value = value[2:]
-    elif value.startswith("'"):
-        value = value[1:]
-    elif value.endswith(","):
-        value = value[:-1]
-    return value
+    diff_file = None
+    if report_format in (JSONL_REPORT, CSV_REPORT, PARQUET_REPORT):
+        diff_file = diff_report_path(key_column, value_column, base_name, report_format)
+        if needs_update(diff_file, bool(changed)):
+
+            def write_diff():
+                rows = write_diff_report(
+                    diff_file, iter_diff_rows(excel_data, php_data, statuses), report_format
+                )
+                print(f"Diff report generated: {diff_file}")
+                return {"keys": rows}
+
+            writers.append(("write_diff_report", write_diff, {}))
+
+    renames = None
+    if "report" not in text_exports:
+        report_file = None
+    # The report only lists differing keys, so it is stale when a differing key
+    # (before or after this run) changed or when a key changed status. Renames are
+    # proposed from the PHP keys missing in the sheet, so those count as well.
+    elif needs_update(
+        report_file,
+        any(key in statuses or key in old_statuses for key in changed)
+        or (detect_renames and any(key not in excel_data for key in changed_php))
+        or (state is not None and state.get("renames", False) != detect_renames),
+    ):
+        if detect_renames:
+            with stage(profile, "find_renames") as counts:
+                renames = find_renames(
+                    missing_in_php,
+                    {key: value for key, value in php_data.items() if key not in excel_data},
+                )
+                counts.update(keys=len(missing_in_php), renames=len(renames))
+        writers.append(
+            (
+                "write_comparison_report",
+                functools.partial(
+                    write_comparison_report,
+                    report_file,
+                    excel_file_name,
+                    sheet_name,
+                    php_file_path,
+                    missing_in_php,
+                    modified_values,
+                    renames,
+                ),
+                {"keys": len(missing_in_php) + len(modified_values)},
+            )
+        )
+
+    modified_file = os.path.join("output", f"{base_name}_modified.php")
+    modified_stale = php_file_changed or not changed_excel.isdisjoint(php_data)
+    if shard_depth is not None:
+        modified_stale = needs_update(
+            os.path.join("output", f"{base_name}_modified", INDEX_FILE), modified_stale
+        )
+    if needs_update(modified_file, modified_stale):
+        writers.append(
+            (
+                "generate_modified_php_file",
+                functools.partial(
+                    generate_modified_php_file,
+                    php_file_path,
+                    excel_data,
+                    php_data,
+                    base_name,
+                    php_spans,
+                    mmap_scan,
+                    shard_depth,
+                ),
+                {"keys": len(php_data)},
+            )
+        )
 
+    new_keys_file = os.path.join("output", f"{base_name}_new_keys.php")
+    if needs_update(
+        new_keys_file,
+        any(statuses.get(key) == MISSING or old_statuses.get(key) == MISSING for key in changed),
+    ):
+        writers.append(
+            (
+                "generate_new_keys_php_file",
+                functools.partial(generate_new_keys_php_file, excel_data, php_data, base_name),
+                {"keys": len(missing_in_php)},
+            )
+        )
+
+    run_writers(writers, profile, output_workers)
 
-def extract_php_key_values(php_file_path):
+    print("\nSUMMARY:")
+    print(f"- Keys in Excel but missing in PHP: {BOLD}{len(missing_in_php)}{RESET}")
+    print(f"- Keys with modified values: {BOLD}{len(modified_values)}{RESET}")
+    if renames is not None:
+        print(f"- Missing keys that may be renamed PHP keys: {BOLD}{len(renames)}{RESET}")
+
+    if incremental:
+        with stage(profile, "save_state"):
+            save_state(
+                state_file,
+                {
+                    "php_file": php_file_digest,
+                    "excel": excel_hashes,
+                    "php": php_hashes,
+                    "status": statuses,
+                    "renames": detect_renames,
+                    "outputs": {
+                        output_file: file_hash(output_file)
+                        for output_file in output_files
+                        if os.path.isfile(output_file)
+                    },
+                },
+            )
+
+    return {
+        "excel_keys": len(excel_data),
+        "php_keys": len(php_data),
+        "missing_in_php": len(missing_in_php),
+        "modified_values": len(modified_values),
+        "changed_keys": len(changed),
+        "possible_renames": None if renames is None else len(renames),
+        "report_file": report_file,
+        "diff_file": diff_file,
+    }
+
+
+def extract_php_key_values(php_file_path, mmap_scan=False, compact=False, parse_workers=None):
     """
     Extract key-value pairs from a PHP file with nested structure support.
 
     Args:
         php_file_path (str): Path to the PHP file
+        mmap_scan (bool): Tokenize the memory-mapped bytes of the file instead of
+            decoding it as a whole, for very large files
+        compact (bool): Return a `KeyStore`, which keeps the keys as path segments
+            instead of dotted strings, for deep trees held in memory for long.
+            Ignored with mmap_scan
+        parse_workers (int): Parse the top-level arrays of the file on this many
+            processes, see `php_parser.parse_php_parallel`. Ignored with mmap_scan
+            or compact
 
     Returns:
-        dict: Dictionary containing key-value pairs from the PHP file
+        dict | KeyStore: Dictionary containing key-value pairs from the PHP file
     """
-    php_data = {}
-    current_path = []
-    current_nested_dict = php_data
-    stack = []
+    if mmap_scan:
+        return scan_php_file(php_file_path, with_spans=False)[0]
 
     with open(php_file_path, "r", encoding="utf-8") as f:
         php_content = f.read()
 
-    lines = php_content.split("\n")
-    for line in lines:
-        line = line.strip()
-
-        if "=>" in line and "[" in line and line.endswith("["):
-            if line.startswith("'") or line.startswith('"'):
-                parts = line.split("=>")
-                if len(parts) == 2:
-                    key = parts[0].strip().strip("'\" ")
-
-                    if current_path:
-                        nested_dict = php_data
-                        for parent_key in current_path:
-                            if parent_key not in nested_dict:
-                                nested_dict[parent_key] = {}
-                            nested_dict = nested_dict[parent_key]
-
-                        nested_dict[key] = {}
-                        stack.append((current_path[:], current_nested_dict))
-                        current_path.append(key)
-                        current_nested_dict = nested_dict[key]
-                    else:
-                        php_data[key] = {}
-                        stack.append((current_path[:], current_nested_dict))
-                        current_path.append(key)
-                        current_nested_dict = php_data[key]
-
-        elif line == "]," or line == "]":
-            if stack:
-                current_path, current_nested_dict = stack.pop()
-
-        elif "=>" in line and (line.startswith("'") or line.startswith('"')):
-            parts = line.split("=>")
-            if len(parts) == 2:
-                key_part = parts[0].strip()
-                value_part = parts[1].strip()
-
-                key = key_part.strip("'\" ")
-
-                value = value_part.strip()
-                if value.startswith("'") and value.endswith("',"):
-                    value = value[1:-2]
-                elif value.startswith("'") and value.endswith("'"):
-                    value = value[1:-1]
-                elif value.startswith('"') and value.endswith('",'):
-                    value = value[1:-2]
-                elif value.startswith('"') and value.endswith('"'):
-                    value = value[1:-1]
-                elif value.endswith(","):
-                    value = value[:-1]
-
-                if current_path:
-                    nested_dict = php_data
-                    for parent_key in current_path:
-                        if parent_key not in nested_dict:
-                            nested_dict[parent_key] = {}
-                        nested_dict = nested_dict[parent_key]
-                    nested_dict[key] = value
-                else:
-                    php_data[key] = value
-
-    flattened_php = flatten_dict(php_data)
-    return flattened_php
-
-
-def flatten_dict(nested_dict, parent_key="", separator="."):
+    if compact:
+        return parse_php_to_store(php_content)
+    if parse_workers is not None and parse_workers > 1:
+        return parse_php_parallel(php_content, parse_workers)[0]
+    return parse_php_content(php_content)
+
+
+def index_php_file(php_file_path, mmap_scan=False, parse_workers=None):
     """
-    Flatten a nested dictionary structure into a single-level dictionary.
+    Extract key-value pairs from a PHP file along with the position of every value.
 
     Args:
-        nested_dict (dict): The nested dictionary to flatten
-        parent_key (str): The parent key for the current recursion level
-        separator (str): Character to use to separate nested keys
+        php_file_path (str): Path to the PHP file
+        mmap_scan (bool): Tokenize the memory-mapped bytes of the file instead of
+            decoding it as a whole, for very large files. The positions are then
+            byte offsets instead of character offsets
+        parse_workers (int): Parse the top-level arrays of the file on this many
+            processes, see `php_parser.parse_php_parallel`. Ignored with mmap_scan
 
     Returns:
-        dict: Flattened dictionary with dot-notation keys
+        tuple: (php_data, php_spans) where php_spans maps each key to the
+        (line_number, start, end) of its value literal in the file
     """
-    items = []
-    for key, value in nested_dict.items():
-        new_key = f"{parent_key}{separator}{key}" if parent_key else key
-        if isinstance(value, dict):
-            items.extend(flatten_dict(value, new_key, separator).items())
-        else:
-            items.append((new_key, value))
-    return dict(items)
+    if mmap_scan:
+        return scan_php_file(php_file_path)
+
+    with open(php_file_path, "r", encoding="utf-8") as f:
+        php_content = f.read()
+
+    if parse_workers is not None and parse_workers > 1:
+        return parse_php_parallel(php_content, parse_workers, with_spans=True)
+    return index_php_content(php_content)
 
 
 if __name__ == "__main__":
+    import pandas as pd
+
     INPUT_EXCEL_FILE = input(f"Give your input {BOLD}excel file Name{RESET}: ")
 
     if not os.path.isfile(INPUT_EXCEL_FILE):
         raise FileNotFoundError(
             f'Error opening "{INPUT_EXCEL_FILE}", check the file location or name and try again! '
         )
-    excel_data = pd.ExcelFile(INPUT_EXCEL_FILE)
+    read_mode = inquire("How should the workbook be read?", READ_MODES)
+    if read_mode == STREAMING_READ:
+        excel_data = open_workbook(INPUT_EXCEL_FILE)
+        sheet_names = excel_data.sheetnames
+    else:
+        excel_data = pd.ExcelFile(INPUT_EXCEL_FILE)
+        sheet_names = excel_data.sheet_names
 
     final_sheet = inquire(
         f"{INPUT_EXCEL_FILE} has following sheets, select one to proceed",
-        excel_data.sheet_names,
+        sheet_names,
     )
 
     print(f"Selected sheet: {final_sheet}")
 
-    parsed_sheet = excel_data.parse(f"{final_sheet}")
+    profile = profile_from_env("compare")
+    with stage(profile, "read_sheet") as counts:
+        parsed_sheet = open_sheet(
+            INPUT_EXCEL_FILE, f"{final_sheet}", read_mode, excel_data
+        )
+        counts.update(rows=sheet_row_count(parsed_sheet))
     key_column = inquire(
         f"'{final_sheet}' has following columns, select one as your {BOLD}KEY{RESET}",
         list(parsed_sheet.columns),
@@ -515,8 +785,25 @@ if __name__ == "__main__":
             f'Error opening "{INPUT_PHP_FILE}", check the file location or name and try again! '
         )
 
+    php_scan_mode = inquire("How should the PHP file be read?", PHP_SCAN_MODES)
+    comparison_mode = inquire("How should the files be compared?", COMPARISON_MODES)
+    report_format = inquire("Which report format should be written?", REPORT_FORMATS)
+
     # print(
     #     f"Given {INPUT_PHP_FILE} PHP file will be mapped with KEY: {key_column} & value: {value_column} of {parsed_sheet} sheet"
     # )
 
-    process_file(parsed_sheet, key_column, value_column, INPUT_PHP_FILE)
+    process_file(
+        parsed_sheet,
+        key_column,
+        value_column,
+        INPUT_PHP_FILE,
+        excel_file_name=INPUT_EXCEL_FILE,
+        sheet_name=final_sheet,
+        incremental=comparison_mode == INCREMENTAL_COMPARISON,
+        profile=profile,
+        report_format=report_format,
+        mmap_scan=php_scan_mode == MMAP_SCAN,
+    )
+    if profile is not None:
+        profile.report()
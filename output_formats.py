@@ -0,0 +1,243 @@
+import json
+import mmap
+import re
+import struct
+from collections.abc import Mapping
+
+from key_store import CLOSE, OPEN
+from php_emitter import (
+    PHP_FOOTER,
+    PHP_HEADER,
+    WRITE_BUFFER_BYTES,
+    close_line,
+    entry_line,
+    open_line,
+)
+
+PHP_FORMAT = "php"
+MINIFIED_PHP_FORMAT = "php-min"
+JSON_FORMAT = "json"
+PACK_FORMAT = "pack"
+
+# Binary pack: a header, the key table sorted by key, then the UTF-8 keys and
+# values. Every value follows its key, at an offset relative to the start of the data.
+PACK_MAGIC = b"KVP1"
+PACK_HEADER = struct.Struct("<4sI")  # magic, number of keys
+PACK_ENTRY = struct.Struct("<III")  # key offset, key length, value length
+PACK_LIMIT = 2**32
+
+_PHP_ESCAPE = re.compile(r"\\([\\'])")
+
+
+def php_text(value):
+    """
+    Text of a single-quoted PHP literal body, as PHP reads it.
+
+    Args:
+        value (str): The literal without its quotes, e.g. as parsed from a PHP file
+
+    Returns:
+        str: The value with its \\' and \\\\ escapes resolved
+    """
+    if "\\" not in value:
+        return value
+    return _PHP_ESCAPE.sub(r"\1", value)
+
+
+def write_php(output_file, store):
+    """
+    Write a `KeyStore` as an indented PHP array file, like the converter output.
+
+    Args:
+        output_file (str): Path of the file to write
+        store (KeyStore): The key-value pairs, with values escaped for single quotes
+
+    Returns:
+        int: Number of characters written
+    """
+    with open(output_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES) as f:
+        written = f.write(PHP_HEADER)
+        for kind, depth, segment, value in store.walk():
+            if kind == OPEN:
+                written += f.write(open_line(segment, depth))
+            elif kind == CLOSE:
+                written += f.write(close_line(depth))
+            else:
+                written += f.write(entry_line(segment, value, depth))
+        written += f.write(PHP_FOOTER)
+    return written
+
+
+def write_minified_php(output_file, store):
+    """
+    Write a `KeyStore` as a PHP array file on a single line, without whitespace.
+
+    Args:
+        output_file (str): Path of the file to write
+        store (KeyStore): The key-value pairs, with values escaped for single quotes
+
+    Returns:
+        int: Number of characters written
+    """
+    with open(output_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES) as f:
+        written = f.write("<?php return [")
+        separator = ""
+        for kind, _, segment, value in store.walk():
+            if kind == OPEN:
+                written += f.write(f"{separator}'{segment}'=>[")
+                separator = ""
+            elif kind == CLOSE:
+                written += f.write("]")
+                separator = ","
+            else:
+                written += f.write(f"{separator}'{segment}'=>'{value}'")
+                separator = ","
+        written += f.write("];\n")
+    return written
+
+
+def write_json(output_file, store):
+    """
+    Write a `KeyStore` as a JSON document with the same nesting, arrays as objects.
+
+    Args:
+        output_file (str): Path of the file to write
+        store (KeyStore): The key-value pairs, with values escaped for single quotes
+
+    Returns:
+        int: Number of characters written
+    """
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    with open(output_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES) as f:
+        written = f.write("{")
+        separator = ""
+        for kind, _, segment, value in store.walk():
+            if kind == OPEN:
+                written += f.write(f"{separator}{dumps(segment)}:{{")
+                separator = ""
+            elif kind == CLOSE:
+                written += f.write("}")
+                separator = ","
+            else:
+                written += f.write(f"{separator}{dumps(segment)}:{dumps(php_text(value))}")
+                separator = ","
+        written += f.write("}\n")
+    return written
+
+
+def write_pack(output_file, store):
+    """
+    Write the dotted keys of a `KeyStore` as a binary pack, see `PackFile`.
+
+    Args:
+        output_file (str): Path of the file to write
+        store (KeyStore): The key-value pairs, with values escaped for single quotes
+
+    Returns:
+        int: Number of bytes written
+    """
+    pairs = sorted(
+        (key.encode("utf-8"), php_text(value).encode("utf-8")) for key, value in store.items()
+    )
+    table = bytearray()
+    offset = 0
+    for key, value in pairs:
+        table += PACK_ENTRY.pack(offset, len(key), len(value))
+        offset += len(key) + len(value)
+    if offset >= PACK_LIMIT:
+        raise ValueError("The keys and values are too large for a pack")
+
+    with open(output_file, "wb", buffering=WRITE_BUFFER_BYTES) as f:
+        written = f.write(PACK_HEADER.pack(PACK_MAGIC, len(pairs)))
+        written += f.write(table)
+        for key, value in pairs:
+            written += f.write(key)
+            written += f.write(value)
+    return written
+
+
+# format -> (file extension, writer)
+OUTPUT_FORMATS = {
+    PHP_FORMAT: (".php", write_php),
+    MINIFIED_PHP_FORMAT: (".php", write_minified_php),
+    JSON_FORMAT: (".json", write_json),
+    PACK_FORMAT: (".kvp", write_pack),
+}
+
+
+def write_output(output_file, store, output_format=PHP_FORMAT):
+    """
+    Write a `KeyStore` in one of `OUTPUT_FORMATS`.
+
+    Args:
+        output_file (str): Path of the file to write
+        store (KeyStore): The key-value pairs, with values escaped for single quotes
+        output_format (str): One of `OUTPUT_FORMATS`
+
+    Returns:
+        int: Number of characters (bytes for a pack) written
+    """
+    return OUTPUT_FORMATS[output_format][1](output_file, store)
+
+
+class PackFile(Mapping):
+    """
+    Read-only mapping over a binary pack written by `write_pack`.
+
+    The file is memory-mapped and nothing is loaded up front: a lookup is a binary
+    search of the sorted key table, reading only the keys it compares and the
+    value it finds.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path of the pack
+        """
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = PACK_HEADER.unpack_from(self._map)
+        if magic != PACK_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a key-value pack")
+        self._data = PACK_HEADER.size + self._count * PACK_ENTRY.size
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for position in range(self._count):
+            yield self._key(position).decode("utf-8")
+
+    def __getitem__(self, key):
+        wanted = key.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            found = self._key(middle)
+            if found < wanted:
+                low = middle + 1
+            elif found > wanted:
+                high = middle
+            else:
+                offset, key_length, length = self._entry(middle)
+                start = self._data + offset + key_length
+                return str(self._map[start : start + length], "utf-8")
+        raise KeyError(key)
+
+    def _entry(self, position):
+        return PACK_ENTRY.unpack_from(self._map, PACK_HEADER.size + position * PACK_ENTRY.size)
+
+    def _key(self, position):
+        offset, length, _ = self._entry(position)
+        start = self._data + offset
+        return self._map[start : start + length]
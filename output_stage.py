@@ -0,0 +1,106 @@
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from profiling import stage
+
+
+class _ThreadOutput(io.TextIOBase):
+    """
+    Stand-in for sys.stdout while writers run, sending what each writer thread
+    prints to its own buffer so that the output of concurrent writers is not mixed.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self._local = threading.local()
+
+    def capture(self):
+        self._local.buffer = io.StringIO()
+        return self._local.buffer
+
+    def release(self):
+        self._local.buffer = None
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (self.target if buffer is None else buffer).write(text)
+
+    def flush(self):
+        if getattr(self._local, "buffer", None) is None:
+            self.target.flush()
+
+    def isatty(self):
+        # progress bars cannot be redrawn from several threads at once
+        return False
+
+
+def run_writers(writers, profile=None, max_workers=None):
+    """
+    Run independent output writers concurrently on a thread pool.
+
+    Writing the reports and PHP files is mostly file I/O, which releases the GIL,
+    so on slow or network disks the stage takes about as long as its largest file
+    instead of the sum of all of them. What every writer prints is buffered and
+    printed in the order of the writers once they are all done. Every writer runs
+    even when another one fails, and all failures are raised together.
+
+    Args:
+        writers (list): (name, function, counts) tuples. function is called without
+            arguments in its own profiling stage; counts (dict) is recorded with the
+            stage and updated with what function returns, if it returns a dict
+        profile (profiling.RunProfile): Records every writer as a stage, if given.
+            Stages of concurrent writers overlap in time
+        max_workers (int): Number of threads, one per writer by default. With 1 (or a
+            single writer) the writers run one after another in the calling thread
+
+    Raises:
+        ExceptionGroup: The exceptions of all writers that failed, each with a note
+            naming the writer
+    """
+    if not writers:
+        return
+
+    def run(name, function, counts):
+        try:
+            with stage(profile, name) as stage_counts:
+                result = function()
+                stage_counts.update(counts)
+                if isinstance(result, dict):
+                    stage_counts.update(result)
+        except Exception as e:
+            e.add_note(f"while writing {name}")
+            return e
+        return None
+
+    if max_workers == 1 or len(writers) == 1:
+        errors = [run(*writer) for writer in writers]
+    else:
+        output = _ThreadOutput(sys.stdout)
+
+        def run_captured(name, function, counts):
+            buffer = output.capture()
+            try:
+                return buffer, run(name, function, counts)
+            finally:
+                output.release()
+
+        sys.stdout = output
+        try:
+            with ThreadPoolExecutor(max_workers or len(writers)) as executor:
+                results = list(executor.map(lambda writer: run_captured(*writer), writers))
+        finally:
+            sys.stdout = output.target
+
+        errors = []
+        for buffer, error in results:
+            print(buffer.getvalue(), end="")
+            errors.append(error)
+
+    failed = [(name, error) for (name, _, _), error in zip(writers, errors) if error is not None]
+    if failed:
+        raise ExceptionGroup(
+            f"Could not write {', '.join(name for name, _ in failed)}",
+            [error for _, error in failed],
+        )
@@ -0,0 +1,109 @@
+import contextlib
+
+INDENT = "    "
+
+PHP_HEADER = "<?php\n\nreturn [\n"
+PHP_FOOTER = "];\n\nreturn $messages;\n?>"
+
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+
+def indent(depth):
+    """
+    Indentation of a line inside `depth` open nested arrays.
+
+    Args:
+        depth (int): Number of open nested arrays, 0 for the top-level array.
+
+    Returns:
+        str: The leading whitespace.
+    """
+    return INDENT * (depth + 1)
+
+
+def open_line(key, depth):
+    """
+    PHP line opening the nested array `key`.
+
+    Args:
+        key (str): The array key.
+        depth (int): Number of arrays already open around it.
+
+    Returns:
+        str: The line, newline included.
+    """
+    return f"{indent(depth)}'{key}' => [\n"
+
+
+def entry_line(key, value, depth):
+    """
+    PHP line holding a single key-value pair.
+
+    Args:
+        key (str): The key.
+        value (str): The value, already escaped for a single-quoted literal.
+        depth (int): Number of arrays open around it.
+
+    Returns:
+        str: The line, newline included.
+    """
+    return f"{indent(depth)}'{key}' => '{value}',\n"
+
+
+def close_line(depth):
+    """
+    PHP line closing a nested array.
+
+    Args:
+        depth (int): Number of arrays open around the one being closed.
+
+    Returns:
+        str: The line, newline included.
+    """
+    return f"{indent(depth)}],\n"
+
+
+def write_php_file(output_file, chunks):
+    """
+    Write PHP source to a file as it is produced.
+
+    Chunks go straight to a buffered file handle, so the file never has to be
+    held in memory as a whole and writing starts with the first chunk.
+
+    Args:
+        output_file (str): Path of the file to write.
+        chunks (iterable): Consecutive chunks of the PHP source.
+
+    Returns:
+        int: Number of characters written.
+    """
+    written = 0
+    with open(output_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES) as f:
+        for chunk in chunks:
+            written += f.write(chunk)
+    return written
+
+
+def write_php_files(output_files, chunk_columns):
+    """
+    Write the PHP sources of several files side by side as they are produced.
+
+    Args:
+        output_files (list): Paths of the files to write.
+        chunk_columns (iterable): Lists of consecutive chunks, one per file.
+
+    Returns:
+        list: Number of characters written to every file.
+    """
+    written = [0] * len(output_files)
+    with contextlib.ExitStack() as stack:
+        files = [
+            stack.enter_context(
+                open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
+            )
+            for path in output_files
+        ]
+        for chunks in chunk_columns:
+            for index, (f, chunk) in enumerate(zip(files, chunks)):
+                written[index] += f.write(chunk)
+    return written
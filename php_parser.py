@@ -0,0 +1,292 @@
+import array
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+
+def unquote_php_value(value):
+    """
+    Strip the quotes and trailing comma around a PHP value literal.
+
+    Args:
+        value (str): The stripped value part of a "'key' => value" line.
+
+    Returns:
+        str: The bare value.
+    """
+    quote = value[:1]
+    if quote == "'" or quote == '"':
+        if value.endswith(quote + ","):
+            return value[1:-2]
+        if value.endswith(quote):
+            return value[1:-1]
+    if value.endswith(","):
+        return value[:-1]
+    return value
+
+
+def _drop_subtree(flat, children, path, spans=None):
+    """
+    Forget a previously parsed array, as PHP does when the key is assigned again.
+
+    Only the keys recorded under the array are visited, so dropping costs no more
+    than parsing them did.
+
+    Args:
+        flat (dict): The flat key-value map built so far.
+        children (dict): Dot-notation keys of every array seen so far, mapped to
+            the keys (values and arrays) recorded directly under it.
+        path (str): Dot-notation key of the array being replaced.
+        spans (dict): Value spans recorded so far, if any.
+    """
+    pending = children.pop(path)
+    while pending:
+        key = pending.pop()
+        flat.pop(key, None)
+        if spans is not None:
+            spans.pop(key, None)
+        pending.extend(children.pop(key, ()))
+
+
+def index_php_content(php_content):
+    """
+    Parse the contents of a PHP array file into a flat, dot-notation key-value map,
+    recording where the value literal of every key sits in the contents.
+
+    The contents are tokenized line by line in a single pass: every "'key' => ["
+    line pushes a key path, every "]" line pops one and every "'key' => value" line
+    is stored straight under its full dotted key. Lines with several "=>" (or
+    anything else) are ignored.
+
+    Args:
+        php_content (str): Contents of the PHP file.
+
+    Returns:
+        tuple: (values, spans) where values maps dot-notation keys to unquoted
+        values, and spans maps the same keys to (line_number, start, end). The
+        line number is 1-based and php_content[start:end] is the value literal,
+        quotes included and trailing comma excluded.
+    """
+    return _tokenize(php_content, {})
+
+
+def parse_php_content(php_content):
+    """
+    Parse the contents of a PHP array file into a flat, dot-notation key-value map.
+
+    Same as `index_php_content`, without recording value spans.
+
+    Args:
+        php_content (str): Contents of the PHP file.
+
+    Returns:
+        dict: Dictionary with dot-notation keys and unquoted values.
+    """
+    return _tokenize(php_content)[0]
+
+
+def _tokenize(php_content, spans=None, children=None, first_line=1, offset=0):
+    """
+    Single pass over the PHP contents shared by `index_php_content` and
+    `parse_php_content`.
+
+    Args:
+        php_content (str): Contents of the PHP file.
+        spans (dict): Dictionary to record value spans into, or None to skip them.
+        children (dict): Dictionary to record the keys under every array into, see
+            `_drop_subtree`.
+        first_line (int): Line number of the first line, when the contents are a
+            part of a file starting at a line boundary.
+        offset (int): Offset of the contents in that file.
+
+    Returns:
+        tuple: (values, spans).
+    """
+    flat = {}
+    if children is None:
+        children = {}
+    paths = []
+    prefix = ""
+    # keys recorded directly under the innermost open array (None at the top level)
+    siblings = None
+    line_end = offset - 1
+
+    for line_number, raw_line in enumerate(php_content.split("\n"), start=first_line):
+        line_end += len(raw_line) + 1
+        parts = raw_line.split("=>")
+        if len(parts) != 2:
+            # a line holding only "]" or "]," closes the innermost array
+            if len(parts) == 1 and paths and raw_line.strip() in ("]", "],"):
+                paths.pop()
+                if paths:
+                    prefix = f"{paths[-1]}."
+                    siblings = children[paths[-1]]
+                else:
+                    prefix = ""
+                    siblings = None
+            continue
+
+        key, value = parts
+        key = key.strip()
+        if key[:1] != "'" and key[:1] != '"':
+            continue
+        path = prefix + key.strip("'\" ")
+        value = value.strip()
+
+        if path in children:
+            _drop_subtree(flat, children, path, spans)
+        if siblings is not None:
+            siblings.append(path)
+
+        if value.endswith("["):
+            if flat.pop(path, None) is not None and spans is not None:
+                del spans[path]
+            siblings = children[path] = []
+            paths.append(path)
+            prefix = f"{path}."
+            continue
+
+        # same rules as `unquote_php_value`, inlined for speed
+        quote = value[:1]
+        if (quote == "'" or quote == '"') and value.endswith(quote + ","):
+            flat[path] = value[1:-2]
+        elif (quote == "'" or quote == '"') and value.endswith(quote):
+            flat[path] = value[1:-1]
+        elif value.endswith(","):
+            flat[path] = value[:-1]
+        else:
+            flat[path] = value
+
+        if spans is not None:
+            # the value literal runs from the first non-blank after "=>"
+            start = line_end - len(raw_line[raw_line.index("=>") + 2 :].lstrip())
+            literal = value[:-1].rstrip() if value.endswith(",") else value
+            spans[path] = (line_number, start, start + len(literal))
+
+    return flat, spans
+
+
+# Ends of the lines that may open or close an array. Both start with a literal,
+# which the regex engine searches for quickly, and the lines are checked with the
+# rules of `_tokenize`.
+_OPENING_END = re.compile(r"\[[^\S\n]*$", re.M)
+_CLOSING_END = re.compile(r"\][^\S\n]*,?[^\S\n]*$", re.M)
+
+# Parts the contents are split into for every worker, so that workers finishing
+# early pick up more.
+PARTS_PER_WORKER = 4
+
+
+def split_top_level(php_content, parts):
+    """
+    Split the contents of a PHP array file between top-level arrays.
+
+    Only the lines ending with "[" or "]" are looked at, so the scan is much cheaper
+    than tokenizing. Every part starts at a line boundary where no array is open, as
+    `_tokenize` reads it.
+
+    Args:
+        php_content (str): Contents of the PHP file.
+        parts (int): Number of parts wanted, of about the same size.
+
+    Returns:
+        list: Offsets where the parts start, the first one being 0.
+    """
+    ends = sorted(
+        [(match.end(), True) for match in _OPENING_END.finditer(php_content)]
+        + [(match.end(), False) for match in _CLOSING_END.finditer(php_content)]
+    )
+    starts = [0]
+    size = len(php_content) // max(parts, 1)
+    depth = 0
+    for end, opening in ends:
+        line = php_content[php_content.rfind("\n", 0, end) + 1 : end]
+        if opening:
+            key_value = line.split("=>")
+            if len(key_value) == 2 and key_value[0].strip()[:1] in ("'", '"'):
+                depth += 1
+        elif depth and line.strip() in ("]", "],"):
+            depth -= 1
+            if not depth and end - starts[-1] >= size:
+                starts.append(end + 1)
+    if starts[-1] >= len(php_content):
+        starts.pop()
+    return starts
+
+
+def _tokenize_part(php_content, first_line, offset, with_spans):
+    """
+    Tokenize a part of a file in a worker process, see `parse_php_parallel`.
+
+    Keys and values are sent back joined by newlines, which they cannot contain, as
+    a few long strings are much faster to pass between processes than a dict.
+    """
+    children = {}
+    flat, spans = _tokenize(php_content, {} if with_spans else None, children, first_line, offset)
+    # every key assigned in the part, even if dropped since, starts with one of
+    # the top-level keys still in the part
+    roots = {key.partition(".")[0] for key in flat}
+    roots.update(key.partition(".")[0] for key in children)
+    positions = None
+    if with_spans:
+        positions = array.array("q", itertools.chain.from_iterable(spans.values()))
+    return len(flat), "\n".join(flat), "\n".join(flat.values()), positions, roots
+
+
+def parse_php_parallel(php_content, workers=None, with_spans=False):
+    """
+    Parse the contents of a PHP array file on several processes.
+
+    The contents are split between top-level arrays with `split_top_level`, every
+    part is tokenized in a worker process and the flat maps are merged in order.
+    The result is the same as `parse_php_content` (or `index_php_content`), key
+    order included: parts only combine as they would sequentially when they share no
+    top-level key, so if a top-level key (up to its first dot) is assigned in several
+    parts, the contents are parsed again in a single pass.
+
+    Args:
+        php_content (str): Contents of the PHP file.
+        workers (int): Number of worker processes, defaults to the number of CPUs.
+        with_spans (bool): Also record value spans, as `index_php_content` does.
+
+    Returns:
+        tuple: (values, spans), spans being None without with_spans.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    starts = split_top_level(php_content, workers * PARTS_PER_WORKER) if workers > 1 else [0]
+    if len(starts) < 2:
+        return _tokenize(php_content, {} if with_spans else None)
+
+    bounds = [*starts[1:], len(php_content)]
+    first_lines = [1]
+    for start, end in zip(starts, bounds[:-1]):
+        first_lines.append(first_lines[-1] + php_content.count("\n", start, end))
+
+    flat = {}
+    spans = {} if with_spans else None
+    seen = set()
+    with ProcessPoolExecutor(max_workers=min(workers, len(starts))) as executor:
+        results = executor.map(
+            _tokenize_part,
+            [php_content[start:end] for start, end in zip(starts, bounds)],
+            first_lines,
+            starts,
+            [with_spans] * len(starts),
+        )
+        for count, keys, values, positions, roots in results:
+            if not seen.isdisjoint(roots):
+                # a key assigned again in a later part, which may replace or extend
+                # what earlier parts read
+                executor.shutdown(cancel_futures=True)
+                return _tokenize(php_content, {} if with_spans else None)
+            seen |= roots
+            if not count:
+                continue
+            keys = keys.split("\n")
+            flat.update(zip(keys, values.split("\n")))
+            if with_spans:
+                positions = iter(positions)
+                spans.update(zip(keys, zip(positions, positions, positions)))
+    return flat, spans
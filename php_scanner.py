@@ -0,0 +1,151 @@
+import contextlib
+import io
+import mmap
+
+from php_parser import _drop_subtree, unquote_php_value
+
+# Blanks around the tokens of a line, the line break excluded
+BLANKS = b" \t\r\x0b\x0c"
+
+
+@contextlib.contextmanager
+def map_php_file(php_file_path):
+    """
+    Memory-map a PHP file read-only.
+
+    Args:
+        php_file_path (str): Path to the PHP file
+
+    Yields:
+        mmap.mmap | bytes: The mapped file, or b"" for an empty file (which
+        cannot be mapped)
+    """
+    with open(php_file_path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b""
+            return
+        with mapped:
+            yield mapped
+
+
+def scan_php_file(php_file_path, with_spans=True):
+    """
+    Parse a PHP array file into a flat, dot-notation key-value map without
+    decoding it as a whole.
+
+    The file is memory-mapped and tokenized as UTF-8 bytes in place; only the key
+    and value of every "'key' => value" line are decoded. The resulting keys and
+    values are the same as `php_parser.index_php_content` gives for the decoded
+    file, except that only ASCII whitespace is stripped and only "\\n" ends a line.
+
+    Args:
+        php_file_path (str): Path to the PHP file
+        with_spans (bool): Whether to record the position of every value literal
+
+    Returns:
+        tuple: (values, spans) where spans maps the keys to (line_number, start,
+        end) byte offsets of the value literal in the file, quotes included and
+        trailing comma excluded, or is None when with_spans is False
+    """
+    with map_php_file(php_file_path) as content:
+        return _scan(content, {} if with_spans else None)
+
+
+def _scan(content, spans=None):
+    """
+    Single pass over the bytes of a PHP file, see `scan_php_file`.
+
+    Same line grammar as `php_parser.index_php_content`: every "'key' => [" line
+    pushes a key path, every "]" line pops one and every "'key' => value" line is
+    stored straight under its full dotted key.
+
+    Args:
+        content (mmap.mmap | bytes): Contents of the PHP file
+        spans (dict): Dictionary to record value spans into, or None to skip them
+
+    Returns:
+        tuple: (values, spans)
+    """
+    if not isinstance(content, mmap.mmap):
+        content = io.BytesIO(content)
+    flat = {}
+    # keys recorded directly under every array seen so far
+    children = {}
+    paths = []
+    prefix = ""
+    siblings = None
+    line_end = 0
+
+    for line_number, raw_line in enumerate(iter(content.readline, b""), start=1):
+        line_end += len(raw_line)
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        first = line[:1]
+        if first == b"]":
+            if (line == b"]" or line == b"],") and paths:
+                paths.pop()
+                prefix = f"{paths[-1]}." if paths else ""
+                siblings = children[paths[-1]] if paths else None
+            continue
+        if first != b"'" and first != b'"':
+            continue
+
+        parts = line.split(b"=>")
+        if len(parts) != 2:
+            continue
+
+        key, value = parts
+        path = prefix + key.decode("utf-8").rstrip().strip("'\" ")
+        value = value.strip()
+
+        if path in children:
+            _drop_subtree(flat, children, path, spans)
+        if siblings is not None:
+            siblings.append(path)
+
+        if value.endswith(b"["):
+            flat.pop(path, None)
+            if spans is not None:
+                spans.pop(path, None)
+            siblings = children[path] = []
+            paths.append(path)
+            prefix = f"{path}."
+            continue
+
+        flat[path] = unquote_php_value(value.decode("utf-8"))
+        if spans is not None:
+            # the value literal runs from the first non-blank after "=>"
+            start = line_end - len(raw_line[raw_line.index(b"=>") + 2 :].lstrip(BLANKS))
+            literal = value[:-1].rstrip() if value.endswith(b",") else value
+            spans[path] = (line_number, start, start + len(literal))
+
+    return flat, spans
+
+
+def rewrite_php_file(php_file_path, output_file, patches, replace):
+    """
+    Copy a PHP file to output_file, replacing some value literals.
+
+    Untouched byte ranges are written straight from the memory-mapped input, only
+    the replaced literals are decoded and encoded.
+
+    Args:
+        php_file_path (str): Path to the original PHP file
+        output_file (str): Path of the file to write
+        patches (list): Sorted (start, end, key) tuples, with the byte offsets of
+            the value literal of key from `scan_php_file`
+        replace (callable): Called with (key, old_literal), returns the new literal
+    """
+    with map_php_file(php_file_path) as content, open(output_file, "wb") as f:
+        with memoryview(content) as view:
+            position = 0
+            for start, end, key in patches:
+                old_literal = str(view[start:end], "utf-8")
+                f.write(view[position:start])
+                f.write(replace(key, old_literal).encode("utf-8"))
+                position = end
+            f.write(view[position:])
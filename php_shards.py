@@ -0,0 +1,225 @@
+import contextlib
+import hashlib
+import os
+import re
+
+from php_emitter import PHP_FOOTER, PHP_HEADER, close_line, entry_line, indent, open_line
+from php_parser import parse_php_content
+
+INDEX_FILE = "index.php"
+ROOT_SHARD = "_root"
+SAFE_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def shard_file_name(path, used):
+    """
+    File name of the shard holding a group, stable across runs.
+
+    The name is the dotted group path when every segment is safe in a file name.
+    Otherwise, or when the name is already used on a case-insensitive file system,
+    unsafe characters are replaced and a hash of the path is appended.
+
+    Args:
+        path (tuple): Segments of the group path
+        used (set): Lower-cased names given so far, updated with the new name
+
+    Returns:
+        str: The file name, with ".php"
+    """
+    name = ".".join(path)
+    if not all(SAFE_NAME.fullmatch(segment) for segment in path) or name.lower() in used:
+        digest = hashlib.blake2b("\0".join(path).encode("utf-8"), digest_size=4).hexdigest()
+        name = f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}-{digest}"
+    used.add(name.lower())
+    return f"{name}.php"
+
+
+def read_shard_index(output_dir):
+    """
+    File names of the shards listed by the index of a shard directory.
+
+    Args:
+        output_dir (str): The shard directory
+
+    Returns:
+        set: The file names, empty when there is no index yet
+    """
+    try:
+        with open(os.path.join(output_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+            return set(parse_php_content(f.read()).values())
+    except FileNotFoundError:
+        return set()
+
+
+class ShardWriter:
+    """
+    Split PHP array source into one file per group at a given depth.
+
+    Every group opened `depth` levels deep (a top-level key with depth 1) goes to its
+    own file returning the contents of the group. Everything outside those groups
+    goes to "_root.php", and "index.php" maps the dotted path of every group to its
+    file, so that an app can include only the groups it needs. The source is read
+    with the line grammar of `php_parser`, as it is written, and the shards are
+    indented like the converter output. A shard is only written when its contents
+    changed, and shards of groups that disappeared are removed.
+    """
+
+    def __init__(self, output_dir, depth=1):
+        """
+        Args:
+            output_dir (str): Directory of the shards, created if needed
+            depth (int): Nesting level of the groups that get their own file
+        """
+        if depth < 1:
+            raise ValueError("The shard depth must be at least 1")
+        self.output_dir = output_dir
+        self.depth = depth
+        self.written = 0
+        self._pending = ""
+        self._path = []
+        self._root = []
+        self._shard = None
+        # path -> file name of the shards in the output, in the order of the source
+        self._files = {}
+        # path -> file name of every shard written, even if replaced since
+        self._names = {}
+        # path -> position in the root shard of the values at the shard depth
+        self._root_entries = {}
+        self._used = {ROOT_SHARD.lower(), INDEX_FILE[: -len(".php")]}
+        self._previous = read_shard_index(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, text):
+        """
+        Feed the next piece of the PHP source, in any size.
+
+        Args:
+            text (str): The piece of source
+        """
+        lines = (self._pending + text).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._line(line.strip())
+
+    def close(self):
+        """
+        Write the root shard and the index, and remove shards no longer listed.
+
+        Returns:
+            dict: Numbers of "shards", shards "written" (changed) and "removed"
+        """
+        self._line(self._pending.strip())
+        self._pending = ""
+        while self._path:
+            self._line("]")
+
+        self._save(ROOT_SHARD + ".php", self._root)
+        index = [entry_line("root", ROOT_SHARD + ".php", 0), open_line("shards", 0)]
+        index.extend(entry_line(".".join(path), name, 1) for path, name in self._files.items())
+        index.append(close_line(0))
+        self._save(INDEX_FILE, index)
+
+        removed = 0
+        stale = self._previous | set(self._names.values())
+        for name in stale - set(self._files.values()) - {ROOT_SHARD + ".php"}:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.output_dir, name))
+                removed += 1
+        return {"shards": len(self._files), "written": self.written, "removed": removed}
+
+    def _line(self, line):
+        if not line:
+            return
+        first = line[0]
+        if first == "]":
+            if (line == "]" or line == "],") and self._path:
+                if len(self._path) == self.depth:
+                    self._close_shard()
+                    self._path.pop()
+                else:
+                    self._path.pop()
+                    self._append(close_line(self._level()))
+            return
+
+        quoted = first == "'" or first == '"'
+        if not self._path and not quoted:
+            # the PHP header and footer around the top-level array
+            return
+        opens = False
+        # list items and other lines without a key are copied as they are
+        path = None
+        if quoted:
+            parts = line.split("=>", 1)
+            if len(parts) == 2:
+                opens = parts[1].strip().endswith("[")
+                path = (*self._path, parts[0].rstrip().strip("'\" "))
+                if self._shard is None:
+                    self._replace(path)
+
+        if opens and len(path) == self.depth:
+            self._path.append(path[-1])
+            self._shard = []
+            return
+        if path is not None and self._shard is None and len(path) == self.depth:
+            self._root_entries[path] = len(self._root)
+        self._append(f"{indent(self._level())}{line}\n")
+        if opens:
+            self._path.append(path[-1])
+
+    def _replace(self, path):
+        """Forget what an assignment outside the shards replaces, as PHP does."""
+        index = self._root_entries.pop(path, None)
+        if index is not None:
+            self._root[index] = ""
+        self._files.pop(path, None)
+        if len(path) < self.depth:
+            for shard in [shard for shard in self._files if shard[: len(path)] == path]:
+                del self._files[shard]
+            for entry in [entry for entry in self._root_entries if entry[: len(path)] == path]:
+                self._root[self._root_entries.pop(entry)] = ""
+
+    def _level(self):
+        return len(self._path) - (self.depth if self._shard is not None else 0)
+
+    def _append(self, text):
+        (self._root if self._shard is None else self._shard).append(text)
+
+    def _close_shard(self):
+        path = tuple(self._path)
+        # a group assigned again keeps the file name of its first shard
+        name = self._names.get(path) or shard_file_name(path, self._used)
+        self._names[path] = name
+        self._files[path] = name
+        self._save(name, self._shard)
+        self._shard = None
+
+    def _save(self, name, lines):
+        text = PHP_HEADER + "".join(lines) + PHP_FOOTER
+        output_file = os.path.join(self.output_dir, name)
+        try:
+            with open(output_file, "r", encoding="utf-8", newline="") as f:
+                if f.read() == text:
+                    return
+        except FileNotFoundError:
+            pass
+        with open(output_file, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        self.written += 1
+
+
+def write_php_shards(output_dir, chunks, depth=1):
+    """
+    Write PHP source as shards, see `ShardWriter`.
+
+    Args:
+        output_dir (str): Directory of the shards
+        chunks (iterable): Consecutive chunks of the PHP source
+        depth (int): Nesting level of the groups that get their own file
+
+    Returns:
+        dict: Numbers of "shards", shards "written" (changed) and "removed"
+    """
+    shards = ShardWriter(output_dir, depth)
+    for chunk in chunks:
+        shards.write(chunk)
+    return shards.close()
@@ -0,0 +1,209 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Set to "table", "json" or "both" to profile interactive runs.
+PROFILE_ENV = "KVM_PROFILE"
+# Set to a stage name to also run that stage under cProfile.
+CPROFILE_ENV = "KVM_CPROFILE"
+
+PROFILE_DIR = "reports"
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of the process so far.
+
+    Returns:
+        float: Peak RSS in MB, or None where it cannot be measured
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+class RunProfile:
+    """
+    Wall time, CPU time, peak RSS and row/key counts of every stage of a run.
+
+    Stages are recorded with the `stage` context manager. The peak RSS of a stage
+    is the high-water mark of the process at the end of it, so a stage that raises
+    the mark is the one that needed the memory.
+    """
+
+    def __init__(self, name, print_table=True, write_json=False, cprofile_stage=None):
+        """
+        Args:
+            name (str): Name of the run, used in the JSON profile file name
+            print_table (bool): Print a summary table in `report`
+            write_json (bool): Write a JSON profile to PROFILE_DIR in `report`
+            cprofile_stage (str): Name of a stage to run under cProfile, if any
+        """
+        self.name = name
+        self.print_table = print_table
+        self.write_json = write_json
+        self.cprofile_stage = cprofile_stage
+        self.started_at = datetime.now()
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Measure a stage of the run.
+
+        Yields:
+            dict: Counts to record with the stage, e.g. {"rows": 100, "keys": 80}
+        """
+        counts = {}
+        profiler = cProfile.Profile() if name == self.cprofile_stage else None
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield counts
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            self.stages.append(
+                {
+                    "stage": name,
+                    "wall_seconds": round(time.perf_counter() - wall, 4),
+                    "cpu_seconds": round(time.process_time() - cpu, 4),
+                    "peak_rss_mb": _round(peak_rss_mb()),
+                    **counts,
+                }
+            )
+            if profiler is not None:
+                self._dump_cprofile(name, profiler)
+
+    def _dump_cprofile(self, name, profiler):
+        """Save the cProfile stats of a stage and print the top entries."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stats_file = os.path.join(PROFILE_DIR, f"{self._file_stem()}_{name}.prof")
+        profiler.dump_stats(stats_file)
+
+        listing = io.StringIO()
+        pstats.Stats(profiler, stream=listing).sort_stats("cumulative").print_stats(20)
+        print(listing.getvalue())
+        print(f"cProfile stats of '{name}' saved to {stats_file}")
+
+    def _file_stem(self):
+        return f"profile_{self.name}_{self.started_at.strftime('%Y%m%d_%H%M%S')}"
+
+    def as_dict(self):
+        """
+        The profile as a JSON-serializable dictionary.
+
+        Returns:
+            dict: Run name, start time, totals and the list of stages
+        """
+        return {
+            "run": self.name,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_seconds": round(sum(s["wall_seconds"] for s in self.stages), 4),
+            "cpu_seconds": round(sum(s["cpu_seconds"] for s in self.stages), 4),
+            "peak_rss_mb": _round(peak_rss_mb()),
+            "stages": self.stages,
+        }
+
+    def summary_table(self):
+        """
+        Format the stages as a text table.
+
+        Returns:
+            str: The table
+        """
+        counted = sorted(
+            {key for stage in self.stages for key in stage}
+            - {"stage", "wall_seconds", "cpu_seconds", "peak_rss_mb"}
+        )
+        header = f"{'stage':<28} {'wall s':>9} {'cpu s':>9} {'peak RSS MB':>12}"
+        header += "".join(f" {key:>10}" for key in counted)
+        lines = [header, "-" * len(header)]
+        for stage in self.stages:
+            rss = "-" if stage["peak_rss_mb"] is None else f"{stage['peak_rss_mb']:.1f}"
+            line = (
+                f"{stage['stage']:<28} {stage['wall_seconds']:>9.4f} "
+                f"{stage['cpu_seconds']:>9.4f} {rss:>12}"
+            )
+            line += "".join(
+                f" {'' if stage.get(key) is None else stage[key]:>10}" for key in counted
+            )
+            lines.append(line)
+        return "\n".join(lines)
+
+    def report(self):
+        """
+        Print the summary table and/or write the JSON profile, as configured.
+
+        Returns:
+            str: Path of the JSON profile, or None if none was written
+        """
+        if self.print_table:
+            print(f"\nProfile of {self.name}:")
+            print(self.summary_table())
+
+        if not self.write_json:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_file = os.path.join(PROFILE_DIR, f"{self._file_stem()}.json")
+        with open(profile_file, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, indent=2)
+        print(f"Profile written to {profile_file}")
+        return profile_file
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def stage(profile, name):
+    """
+    Measure a stage if the run is being profiled.
+
+    Args:
+        profile (RunProfile): The profile of the run, or None when not profiling
+        name (str): Name of the stage
+
+    Returns:
+        contextmanager: Yields the dict of counts to record with the stage
+    """
+    if profile is None:
+        return contextlib.nullcontext({})
+    return profile.stage(name)
+
+
+def profile_from_env(name):
+    """
+    Create a profile for an interactive run if KVM_PROFILE asks for one.
+
+    Args:
+        name (str): Name of the run
+
+    Returns:
+        RunProfile: The profile, or None when profiling is off
+    """
+    mode = os.environ.get(PROFILE_ENV, "").lower()
+    cprofile_stage = os.environ.get(CPROFILE_ENV) or None
+    if mode not in ("table", "json", "both") and cprofile_stage is None:
+        return None
+    return RunProfile(
+        name,
+        print_table=mode in ("table", "both", ""),
+        write_json=mode in ("json", "both"),
+        cprofile_stage=cprofile_stage,
+    )
@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+
+QUIET = 0
+NORMAL = 1
+VERBOSE = 2
+VERBOSITY_LEVELS = {"quiet": QUIET, "normal": NORMAL, "verbose": VERBOSE}
+
+# Set to "quiet", "normal" or "verbose" to change the verbosity of interactive runs.
+VERBOSITY_ENV = "KVM_VERBOSITY"
+
+BAR_WIDTH = 30
+REFRESH_SECONDS = 0.1
+# Without a terminal to redraw on, a counter line is printed every REPORT_STEP of the work.
+REPORT_STEP = 0.1
+DETAIL_BUFFER_BYTES = 1024 * 1024
+
+_verbosity = VERBOSITY_LEVELS.get(os.environ.get(VERBOSITY_ENV, "").lower(), NORMAL)
+
+
+def set_verbosity(level):
+    """
+    Set how much progress output is produced.
+
+    Args:
+        level (int): QUIET (nothing), NORMAL (progress bars or counters) or
+            VERBOSE (also per-item details, written to a log file)
+    """
+    global _verbosity
+    _verbosity = level
+
+
+def get_verbosity():
+    """
+    Returns:
+        int: The current verbosity level
+    """
+    return _verbosity
+
+
+class Progress:
+    """
+    Progress of a loop over a known number of items.
+
+    On a terminal a bar is redrawn at most every REFRESH_SECONDS, otherwise a
+    counter line is printed every REPORT_STEP of the work, so the cost does not
+    grow with the number of items. Per-item details only go to a buffered log
+    file, and only in VERBOSE mode. Use it as a context manager.
+    """
+
+    def __init__(self, label, total, detail_file=None):
+        """
+        Args:
+            label (str): What is being done
+            total (int): Number of items
+            detail_file (str): Log file for per-item details in VERBOSE mode
+        """
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.detail_file = detail_file
+        self.details = False
+        self._log = None
+        self._show = _verbosity >= NORMAL and total > 0
+        self._tty = sys.stdout.isatty()
+        self._last_draw = 0.0
+        self._next_report = REPORT_STEP * total
+        self._reported = 0
+
+    def __enter__(self):
+        if _verbosity >= VERBOSE and self.detail_file is not None:
+            os.makedirs(os.path.dirname(self.detail_file) or ".", exist_ok=True)
+            self._log = open(
+                self.detail_file, "w", encoding="utf-8", buffering=DETAIL_BUFFER_BYTES
+            )
+            self.details = True
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._show:
+            if self._tty:
+                self._draw()
+                sys.stdout.write("\n")
+            elif self.done != self._reported:
+                self._report()
+        if self._log is not None:
+            self._log.close()
+            if _verbosity >= NORMAL:
+                print(f"Details written to {self.detail_file}")
+        return False
+
+    def advance(self, count=1):
+        """
+        Mark items as done.
+
+        Args:
+            count (int): Number of items done since the last call
+        """
+        self.done += count
+        if not self._show:
+            return
+        if self._tty:
+            now = time.perf_counter()
+            if now - self._last_draw >= REFRESH_SECONDS:
+                self._last_draw = now
+                self._draw()
+        elif self.done >= self._next_report:
+            self._report()
+            while self._next_report <= self.done:
+                self._next_report += REPORT_STEP * self.total
+
+    def detail(self, message):
+        """
+        Write a line about a single item to the detail log, in VERBOSE mode.
+
+        Args:
+            message (str): The line, without a newline
+        """
+        if self._log is not None:
+            self._log.write(f"{message}\n")
+
+    def _draw(self):
+        share = min(self.done / self.total, 1)
+        filled = int(share * BAR_WIDTH)
+        sys.stdout.write(
+            f"\r{self.label} [{'#' * filled}{'.' * (BAR_WIDTH - filled)}] "
+            f"{share:4.0%} ({self.done}/{self.total})"
+        )
+        sys.stdout.flush()
+
+    def _report(self):
+        self._reported = self.done
+        print(f"{self.label}: {self.done}/{self.total} ({min(self.done / self.total, 1):.0%})")
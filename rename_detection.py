@@ -0,0 +1,191 @@
+import re
+import zlib
+
+import numpy as np
+
+from comparison import normalize_values
+
+# MinHash locality-sensitive hashing: signatures of BANDS * ROWS hashes, and two
+# items become candidates when all the hashes of one band are equal. With 20
+# bands of 3 rows, pairs with a similarity of 0.4 are found 3 times out of 4 and
+# pairs above 0.6 almost always.
+BANDS = 20
+ROWS = 3
+MAX_MATCHES = 3
+MIN_SIMILARITY = 0.4
+# Buckets with more PHP keys than this (e.g. many keys sharing a value like
+# "OK") are skipped, which keeps the number of candidates linear.
+MAX_BUCKET = 16
+# Shingles hashed at a time when computing signatures.
+BLOCK_SHINGLES = 1 << 18
+
+_PERMUTATIONS = BANDS * ROWS
+_rng = np.random.default_rng(2024)
+_MULTIPLIERS = _rng.integers(1, 2**63, _PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2**63, _PERMUTATIONS, dtype=np.uint64)
+_BAND_MULTIPLIERS = _rng.integers(1, 2**63, ROWS, dtype=np.uint64) | np.uint64(1)
+
+_CAMEL_CASE = re.compile(r"([a-z0-9])([A-Z])")
+_WORDS = re.compile(r"\w+")
+
+
+def shingles(key, normalized_value):
+    """
+    Features of a key and its value that survive a rename or a move.
+
+    Args:
+        key (str): Dot-notation key
+        normalized_value (str): The value, as normalized by `comparison.normalize_value`
+
+    Returns:
+        set: The words of the key, the trigrams of its last segment, the words of
+        the value and the whole value, each tagged with where it comes from
+    """
+    features = {"k" + word for word in _WORDS.findall(_CAMEL_CASE.sub(r"\1 \2", key).lower())}
+    leaf = key.rsplit(".", 1)[-1].lower()
+    features.update("t" + leaf[i : i + 3] for i in range(len(leaf) - 2))
+    features.update("v" + word for word in _WORDS.findall(normalized_value))
+    if normalized_value:
+        features.add("=" + normalized_value)
+    if not features:
+        features.add("k" + key)
+    return features
+
+
+def jaccard(a, b):
+    """
+    Returns:
+        float: Size of the intersection of two sets over the size of their union
+    """
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _signatures(shingle_sets):
+    """MinHash signatures of non-empty sets, one column per set."""
+    hashes = []
+    starts = []
+    for features in shingle_sets:
+        starts.append(len(hashes))
+        hashes.extend(zlib.crc32(feature.encode("utf-8")) for feature in features)
+    hashes = np.array(hashes, dtype=np.uint64)
+    starts = np.array(starts, dtype=np.int64)
+
+    signatures = np.empty((_PERMUTATIONS, len(starts)), dtype=np.uint64)
+    first = 0
+    while first < len(starts):
+        # whole sets of about BLOCK_SHINGLES shingles at a time
+        last = int(np.searchsorted(starts, starts[first] + BLOCK_SHINGLES, "right"))
+        last = max(last, first + 1)
+        stop = starts[last] if last < len(starts) else len(hashes)
+        block = hashes[starts[first] : stop]
+        # multiply-shift hashing, wrapping around 2**64
+        values = (_MULTIPLIERS[:, None] * block[None, :] + _OFFSETS[:, None]) >> np.uint64(32)
+        signatures[:, first:last] = np.minimum.reduceat(
+            values, starts[first:last] - starts[first], axis=1
+        )
+        first = last
+    return signatures
+
+
+def _band_codes(signatures, band):
+    rows = signatures[band * ROWS : (band + 1) * ROWS]
+    return (rows * _BAND_MULTIPLIERS[:, None]).sum(axis=0, dtype=np.uint64)
+
+
+def _candidate_pairs(query_signatures, index_signatures):
+    """(query, index) positions of the pairs sharing at least one band."""
+    pairs = []
+    for band in range(BANDS):
+        index_codes = _band_codes(index_signatures, band)
+        order = np.argsort(index_codes, kind="stable")
+        sorted_codes = index_codes[order]
+        query_codes = _band_codes(query_signatures, band)
+        left = np.searchsorted(sorted_codes, query_codes, "left")
+        sizes = np.searchsorted(sorted_codes, query_codes, "right") - left
+        sizes[sizes > MAX_BUCKET] = 0
+
+        queries = np.repeat(np.arange(len(query_codes)), sizes)
+        within = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        matches = order[np.repeat(left, sizes) + within]
+        pairs.append(queries * index_signatures.shape[1] + matches)
+
+    codes = np.unique(np.concatenate(pairs)) if pairs else np.empty(0, dtype=np.int64)
+    return codes // index_signatures.shape[1], codes % index_signatures.shape[1]
+
+
+def find_renames(
+    missing, candidates, max_matches=MAX_MATCHES, min_similarity=MIN_SIMILARITY
+):
+    """
+    Propose keys a missing key may have been renamed from, or moved from.
+
+    Every key is turned into `shingles` of its key and normalized value. Candidates
+    are found with MinHash locality-sensitive hashing, so the time grows with the
+    number of keys rather than the number of pairs, and only the best candidates of
+    every missing key are scored exactly.
+
+    Args:
+        missing (list): (key, value) of the keys missing in PHP
+        candidates (dict): PHP key-value pairs the keys may have been renamed from,
+            usually the PHP keys that are not in the sheet
+        max_matches (int): Proposals kept for every missing key
+        min_similarity (float): Lowest similarity (Jaccard index of the shingles)
+            of a proposal
+
+    Returns:
+        dict: Missing key -> list of (php_key, php_value, similarity,
+        value_similarity), best first, for the missing keys with proposals
+    """
+    if not missing or not candidates:
+        return {}
+
+    missing_keys = [key for key, _ in missing]
+    missing_values = normalize_values(value for _, value in missing)
+    candidate_keys = list(candidates)
+    candidate_values = normalize_values(candidates.values())
+    missing_shingles = list(map(shingles, missing_keys, missing_values))
+    candidate_shingles = list(map(shingles, candidate_keys, candidate_values))
+
+    missing_signatures = _signatures(missing_shingles)
+    candidate_signatures = _signatures(candidate_shingles)
+    queries, matches = _candidate_pairs(missing_signatures, candidate_signatures)
+    if not len(queries):
+        return {}
+
+    # estimated similarity: the share of equal hashes in the two signatures
+    estimates = np.empty(len(queries))
+    step = max(BLOCK_SHINGLES // _PERMUTATIONS, 1)
+    for start in range(0, len(queries), step):
+        stop = start + step
+        estimates[start:stop] = (
+            missing_signatures[:, queries[start:stop]]
+            == candidate_signatures[:, matches[start:stop]]
+        ).mean(axis=0)
+
+    # the best estimates of every missing key, with some slack for the error
+    order = np.lexsort((-estimates, queries))
+    queries, matches, estimates = queries[order], matches[order], estimates[order]
+    group_starts = np.flatnonzero(np.r_[True, queries[1:] != queries[:-1]])
+    ranks = np.arange(len(queries)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(queries)]))
+    keep = (ranks < max_matches + 2) & (estimates >= min_similarity - 0.15)
+
+    renames = {}
+    for query, match in zip(queries[keep].tolist(), matches[keep].tolist()):
+        similarity = jaccard(missing_shingles[query], candidate_shingles[match])
+        if similarity < min_similarity:
+            continue
+        value_similarity = jaccard(
+            set(_WORDS.findall(missing_values[query])),
+            set(_WORDS.findall(candidate_values[match])),
+        )
+        key = candidate_keys[match]
+        renames.setdefault(missing_keys[query], []).append(
+            (key, candidates[key], round(similarity, 3), round(value_similarity, 3))
+        )
+
+    for proposals in renames.values():
+        proposals.sort(key=lambda proposal: -proposal[2])
+        del proposals[max_matches:]
+    return renames
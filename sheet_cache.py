@@ -0,0 +1,165 @@
+import argparse
+import contextlib
+import hashlib
+import os
+
+CACHE_DIR = os.path.join(".cache", "sheets")
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+CACHE_SUFFIX = ".pkl"
+
+
+def workbook_hash(workbook_path):
+    """
+    Hash the contents of a workbook file.
+
+    Args:
+        workbook_path (str): Path to the Excel workbook
+
+    Returns:
+        str: Hex SHA-256 digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(workbook_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(workbook_path, sheet_name, cache_dir=CACHE_DIR):
+    """
+    Path of the cache entry for a sheet of a workbook, keyed on the workbook contents.
+
+    Args:
+        workbook_path (str): Path to the Excel workbook
+        sheet_name (str): Name of the sheet
+        cache_dir (str): Cache directory
+
+    Returns:
+        str: Path of the cache entry (which may not exist yet)
+    """
+    key = hashlib.sha256(
+        f"{workbook_hash(workbook_path)}\0{sheet_name}".encode("utf-8")
+    ).hexdigest()
+    return os.path.join(cache_dir, f"{key}{CACHE_SUFFIX}")
+
+
+def _cache_entries(cache_dir):
+    """List (last_used, size, path) of every cache entry, least recently used first."""
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_SUFFIX):
+            path = os.path.join(cache_dir, name)
+            # another process may evict the entry while we look at it
+            with contextlib.suppress(FileNotFoundError):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+    return sorted(entries)
+
+
+def evict_cache(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    Remove least recently used cache entries until the cache fits in max_bytes.
+
+    Args:
+        cache_dir (str): Cache directory
+        max_bytes (int): Maximum total size of the cache
+
+    Returns:
+        int: Number of removed entries
+    """
+    entries = _cache_entries(cache_dir)
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """
+    Remove every cache entry.
+
+    Args:
+        cache_dir (str): Cache directory
+
+    Returns:
+        int: Number of removed entries
+    """
+    entries = _cache_entries(cache_dir)
+    for _, _, path in entries:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+    return len(entries)
+
+
+def load_sheet(
+    workbook_path,
+    sheet_name,
+    excel_file=None,
+    use_cache=True,
+    cache_dir=CACHE_DIR,
+    max_bytes=MAX_CACHE_BYTES,
+):
+    """
+    Parse a sheet with pandas, reusing the cached result of an earlier parse of the
+    same workbook contents when there is one.
+
+    Args:
+        workbook_path (str): Path to the Excel workbook
+        sheet_name (str): Name of the sheet to parse
+        excel_file (pandas.ExcelFile): Already opened workbook to parse from, if any
+        use_cache (bool): Set to False to bypass the cache entirely
+        cache_dir (str): Cache directory
+        max_bytes (int): Maximum total size of the cache
+
+    Returns:
+        pandas.DataFrame: The parsed sheet
+    """
+    import pandas as pd
+
+    def parse():
+        workbook = excel_file if excel_file is not None else pd.ExcelFile(workbook_path)
+        return workbook.parse(sheet_name)
+
+    if not use_cache:
+        return parse()
+
+    entry = cache_path(workbook_path, sheet_name, cache_dir)
+    if os.path.isfile(entry):
+        try:
+            sheet = pd.read_pickle(entry)
+            os.utime(entry)
+            return sheet
+        except Exception:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry)
+
+    sheet = parse()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    partial = f"{entry}.{os.getpid()}.tmp"
+    sheet.to_pickle(partial)
+    os.replace(partial, entry)
+    evict_cache(cache_dir, max_bytes)
+    return sheet
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the parsed-sheet cache.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--clear", action="store_true", help="remove every cached sheet")
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"Removed {clear_cache(args.cache_dir)} cached sheets from {args.cache_dir}")
+    else:
+        entries = _cache_entries(args.cache_dir)
+        size = sum(size for _, size, _ in entries)
+        print(f"{len(entries)} cached sheets, {size / 1024 / 1024:.1f} MB in {args.cache_dir}")
@@ -0,0 +1,529 @@
+import numpy as np
+from numpy.dtypes import StringDType
+
+from php_emitter import (
+    PHP_FOOTER,
+    PHP_HEADER,
+    close_line,
+    entry_line,
+    indent,
+    open_line,
+)
+from sheet_reader import StreamingSheet, cell_text
+
+# Rows rendered at a time by `iter_php_chunks`.
+CHUNK_ROWS = 50_000
+
+CLOSING_KEYS = ("]", "],")
+
+TEXT = StringDType()
+
+# (condition, start, stop) rules used to unquote values, in priority order. This
+# is the one definition of the rules, shared by the column-wise and scalar
+# versions below. Conditions are looked up in the affix flags of `_affix_flags`.
+VALUE_RULES = [
+    (("starts_quote", "ends_quote_comma"), 1, -2),
+    (("starts_quote", "ends_quote"), 1, -1),
+    (("ends_quote_comma",), 0, -2),
+    (("starts_star_quote",), 2, None),
+    (("starts_quote",), 1, None),
+    (("ends_comma",), 0, -1),
+]
+
+
+def _text_column(sheet, column):
+    """
+    Read a sheet column as stripped strings, the same way `cell_text(cell).strip()`
+    would, so that full reads give the same text as streaming reads.
+
+    Args:
+        sheet (pandas.DataFrame): The Excel sheet to read from.
+        column (str): The column name to read.
+
+    Returns:
+        numpy.ndarray: Array of stripped strings (missing cells become "nan").
+    """
+    cells = sheet[column].to_numpy(dtype=object)
+    return np.strings.strip(np.array(list(map(cell_text, cells)), dtype=TEXT))
+
+
+def _clean_keys(keys):
+    """
+    Remove quotes from keys and drop anything after a "=>" marker.
+
+    Args:
+        keys (numpy.ndarray): Stripped key strings.
+
+    Returns:
+        numpy.ndarray: Cleaned key strings.
+    """
+    keys = np.strings.replace(keys, "'", "")
+    arrow = np.strings.find(keys, "=>")
+    has_arrow = arrow >= 0
+    if has_arrow.any():
+        keys[has_arrow] = np.strings.strip(np.strings.slice(keys[has_arrow], 0, arrow[has_arrow]))
+    return keys
+
+
+def _affix_flags(values):
+    """
+    Check the quote and comma prefixes/suffixes that the value rules look at.
+
+    Args:
+        values (numpy.ndarray): Value strings.
+
+    Returns:
+        dict: Boolean arrays keyed by the names used in `VALUE_RULES`.
+    """
+    # Work on the first and last two characters only, so that long values are
+    # scanned once instead of once per check.
+    head = np.strings.slice(values, 0, 2)
+    tail = np.strings.slice(values, -2, None)
+    return {
+        "starts_quote": np.strings.startswith(head, "'"),
+        "starts_star_quote": head == "*'",
+        "ends_quote": np.strings.endswith(tail, "'"),
+        "ends_quote_comma": tail == "',",
+        "ends_comma": np.strings.endswith(tail, ","),
+    }
+
+
+def _matches(flags, names):
+    """Combine the named affix flags of a rule into a single mask."""
+    mask = flags[names[0]].copy()
+    for name in names[1:]:
+        mask = mask & flags[name]
+    return mask
+
+
+def _clean_values(values):
+    """
+    Strip the quotes and trailing comma Excel values are typed with, applying only
+    the first matching `VALUE_RULES` rule to each value.
+
+    Args:
+        values (numpy.ndarray): Stripped value strings.
+
+    Returns:
+        numpy.ndarray: Cleaned value strings.
+    """
+    cleaned = values.copy()
+    flags = _affix_flags(values)
+    pending = np.ones(len(values), dtype=bool)
+    for names, start, stop in VALUE_RULES:
+        matches = _matches(flags, names)
+        hits = pending & matches
+        if hits.any():
+            cleaned[hits] = np.strings.slice(values[hits], start, stop)
+        pending &= ~matches
+    return cleaned
+
+
+def _unquote_php_values(values):
+    """
+    Prepare values for a PHP literal: every matching `VALUE_RULES` rule is applied
+    in turn, then single quotes are escaped.
+
+    Args:
+        values (numpy.ndarray): Stripped value strings.
+
+    Returns:
+        numpy.ndarray: Values ready to be wrapped in single quotes.
+    """
+    values = values.copy()
+    flags = _affix_flags(values)
+    for names, start, stop in VALUE_RULES:
+        hits = np.flatnonzero(_matches(flags, names))
+        if not len(hits):
+            continue
+        values[hits] = np.strings.slice(values[hits], start, stop)
+        for flag in flags.values():
+            flag[hits] = False
+
+        # Only values that still start with a quote or "*'", or end with a
+        # comma, can match a later rule, so refresh the flags of those alone.
+        sliced = values[hits]
+        refresh = hits[
+            np.strings.startswith(sliced, "'")
+            | np.strings.startswith(sliced, "*'")
+            | np.strings.endswith(sliced, ",")
+        ]
+        if len(refresh):
+            for name, flag in _affix_flags(values[refresh]).items():
+                flags[name][refresh] = flag
+
+    quoted = np.flatnonzero(np.strings.find(values, "'") >= 0)
+    if len(quoted):
+        values[quoted] = np.strings.replace(values[quoted], "'", "\\'")
+    return values
+
+
+def _last_marked(marks):
+    """
+    For every row, find the position of the closest marked row at or before it.
+
+    Args:
+        marks (numpy.ndarray): Boolean array of marked rows.
+
+    Returns:
+        numpy.ndarray: Positions, or -1 where no row has been marked yet.
+    """
+    positions = np.where(marks, np.arange(len(marks)), -1)
+    return np.maximum.accumulate(positions) if len(positions) else positions
+
+
+def _value_flags(value):
+    """Scalar version of `_affix_flags` for a single value."""
+    head, tail = value[:2], value[-2:]
+    return {
+        "starts_quote": head.startswith("'"),
+        "starts_star_quote": head == "*'",
+        "ends_quote": tail.endswith("'"),
+        "ends_quote_comma": tail == "',",
+        "ends_comma": tail.endswith(","),
+    }
+
+
+def _clean_key(key):
+    """Scalar version of `_clean_keys` for a single stripped key."""
+    key = key.replace("'", "")
+    if "=>" in key:
+        key = key.split("=>")[0].strip()
+    return key
+
+
+def _clean_value(value):
+    """Scalar version of `_clean_values` for a single stripped value."""
+    flags = _value_flags(value)
+    for names, start, stop in VALUE_RULES:
+        if all(flags[name] for name in names):
+            return value[start:stop]
+    return value
+
+
+def _unquote_php_value(value):
+    """Scalar version of `_unquote_php_values` for a single stripped value."""
+    for names, start, stop in VALUE_RULES:
+        if all(_value_flags(value)[name] for name in names):
+            value = value[start:stop]
+    return value.replace("'", "\\'")
+
+
+def sheet_row_count(sheet):
+    """
+    Number of data rows of a sheet, when it is known without reading the sheet.
+
+    Args:
+        sheet (pandas.DataFrame | StreamingSheet): The Excel sheet.
+
+    Returns:
+        int: Number of rows, or None for a streamed sheet.
+    """
+    if isinstance(sheet, StreamingSheet):
+        return None
+    return len(sheet)
+
+
+def rows_to_mapping(rows):
+    """
+    Row-by-row version of `sheet_to_mapping` for streamed sheets.
+
+    Args:
+        rows (iterable): (key, value) cell strings, as yielded by
+            `StreamingSheet.iter_rows`.
+
+    Returns:
+        dict: Dictionary with dot-notation keys and cleaned values.
+    """
+    mapping = {}
+    prefix = ""
+    for key, value in rows:
+        key = key.strip()
+        value = value.strip()
+
+        if not key or key == "nan":
+            prefix = ""
+            continue
+
+        key = _clean_key(key)
+        if value == "[":
+            prefix = f"{prefix}{key}."
+            continue
+        if value == "nan" or not value:
+            continue
+
+        mapping[prefix + key] = _clean_value(value)
+    return mapping
+
+
+def iter_php_lines(rows):
+    """
+    Row-by-row version of `iter_php_chunks` for streamed sheets.
+
+    Args:
+        rows (iterable): (key, value) cell strings, as yielded by
+            `StreamingSheet.iter_rows`.
+
+    Yields:
+        str: Consecutive chunks of the PHP source.
+    """
+    for chunks in iter_php_line_columns(((key, (value,)) for key, value in rows), 1):
+        yield chunks[0]
+
+
+def iter_php_line_columns(rows, columns, block_rows=CHUNK_ROWS):
+    """
+    Row-by-row version of `iter_php_chunk_columns` for streamed sheets.
+
+    Every key is cleaned once for all value columns, and every column keeps its
+    own nesting depth.
+
+    Args:
+        rows (iterable): (key, values) cells, as yielded by
+            `StreamingSheet.iter_columns`.
+        columns (int): Number of value columns.
+        block_rows (int): Number of rows rendered before a chunk is yielded.
+
+    Yields:
+        list: Consecutive chunks of the PHP source of every value column.
+    """
+    depths = [0] * columns
+    blocks = [[PHP_HEADER] for _ in range(columns)]
+
+    for number, (key, values) in enumerate(rows, start=1):
+        key = key.strip()
+        if key in CLOSING_KEYS:
+            for column, lines in enumerate(blocks):
+                if depths[column] > 0:
+                    depths[column] -= 1
+                    lines.append(close_line(depths[column]))
+        else:
+            key = _clean_key(key)
+            for column, value in enumerate(values):
+                value = value.strip()
+                if value == "nan" or not value:
+                    continue
+                if value == "[":
+                    blocks[column].append(open_line(key, depths[column]))
+                    depths[column] += 1
+                else:
+                    blocks[column].append(
+                        entry_line(key, _unquote_php_value(value), depths[column])
+                    )
+
+        if number % block_rows == 0:
+            yield ["".join(lines) for lines in blocks]
+            blocks = [[] for _ in range(columns)]
+
+    for depth, lines in zip(depths, blocks):
+        lines.extend(close_line(level) for level in range(depth - 1, -1, -1))
+        lines.append(PHP_FOOTER)
+    yield ["".join(lines) for lines in blocks]
+
+
+def sheet_to_mapping(sheet, key_column, value_column):
+    """
+    Build the flat, dot-notation key-value mapping of an Excel sheet.
+
+    A row whose value is "[" opens a nested group named after its key, and a row
+    with an empty key closes every open group.
+
+    Args:
+        sheet (pandas.DataFrame | StreamingSheet): The Excel sheet containing data.
+        key_column (str): The column name to use as keys.
+        value_column (str): The column name to use as values.
+
+    Returns:
+        dict: Dictionary with dot-notation keys and cleaned values.
+    """
+    if isinstance(sheet, StreamingSheet):
+        return rows_to_mapping(sheet.iter_rows(key_column, value_column))
+
+    keys = _text_column(sheet, key_column)
+    values = _text_column(sheet, value_column)
+
+    blank = (keys == "") | (keys == "nan")
+    keys = _clean_keys(keys)
+    opens = ~blank & (values == "[")
+    entries = ~blank & ~opens & (values != "nan") & (values != "")
+
+    # Every blank key starts a new group; the prefix of a row is the chain of
+    # openers seen since the last blank key.
+    group = np.cumsum(blank)
+    prefixes = np.full(len(keys), "", dtype=TEXT)
+    path = ""
+    current_group = None
+    opens_at = np.flatnonzero(opens)
+    for position, key in zip(opens_at, keys[opens_at].tolist()):
+        if group[position] != current_group:
+            path = ""
+            current_group = group[position]
+        path = f"{path}{key}."
+        prefixes[position] = path
+
+    last_prefix = _last_marked(blank | opens)[entries]
+    entry_prefixes = np.where(last_prefix >= 0, prefixes[np.maximum(last_prefix, 0)], "")
+
+    full_keys = np.strings.add(entry_prefixes.astype(TEXT), keys[entries])
+    cleaned_values = _clean_values(values[entries])
+    return dict(zip(full_keys.tolist(), cleaned_values.tolist()))
+
+
+def _php_structure(opens, closes, depth):
+    """
+    Nesting of a block of rows: the indentation of every row, which closing rows
+    are written and the depth left open after the block.
+
+    Args:
+        opens (numpy.ndarray): Rows opening a nested array.
+        closes (numpy.ndarray): Rows closing one.
+        depth (int): Number of arrays left open by the previous blocks.
+
+    Returns:
+        tuple: (indents, emitted_closes, depth).
+    """
+    # Nesting depth is a running sum of +1/-1 steps that never goes below zero,
+    # so subtract the lowest (negative) point reached so far.
+    running = depth + np.cumsum(opens.astype(np.int64) - closes.astype(np.int64))
+    depth_after = running - np.minimum(np.minimum.accumulate(running), 0)
+    depth_before = np.concatenate(([depth], depth_after[:-1])).astype(np.int64)
+
+    emitted_closes = closes & (depth_before > 0)
+    indent_depth = np.where(emitted_closes, depth_after, depth_before)
+    indents = np.array(
+        [indent(level) for level in range(int(indent_depth.max(initial=0)) + 1)],
+        dtype=TEXT,
+    )[indent_depth]
+
+    final_depth = int(depth_after[-1]) if len(depth_after) else depth
+    return indents, emitted_closes, final_depth
+
+
+def _php_chunks(keys, value_columns, depths):
+    """
+    Render a block of rows as the PHP lines of several value columns at once.
+
+    The keys are cleaned once for all columns, and the nesting structure is only
+    worked out again for a column whose "[" rows or open depth differ from those
+    of a column already rendered, which is rare for the languages of one sheet.
+
+    Args:
+        keys (numpy.ndarray): Stripped key cells of the block.
+        value_columns (list): Stripped value cells of the block, per column.
+        depths (list): Number of arrays left open by the previous blocks, per column.
+
+    Returns:
+        tuple: (texts, depths) with the PHP lines of the block and the number of
+        arrays still open after it, per column.
+    """
+    closes = np.isin(keys, CLOSING_KEYS)
+    keys = _clean_keys(keys)
+    quoted_keys = np.strings.add(np.strings.add("'", keys), "' => ")
+
+    structures = []
+    texts = []
+    new_depths = []
+    for values, depth in zip(value_columns, depths):
+        skipped = closes | (values == "nan") | (values == "")
+        opens = ~skipped & (values == "[")
+        entries = ~skipped & ~opens
+
+        for known_opens, known_depth, known in structures:
+            if known_depth == depth and np.array_equal(known_opens, opens):
+                indents, emitted_closes, final_depth, structure_lines = known
+                break
+        else:
+            indents, emitted_closes, final_depth = _php_structure(opens, closes, depth)
+            # open and close lines only depend on the structure, render them once
+            structure_lines = np.full(len(keys), "", dtype=TEXT)
+            structure_lines[opens] = indents[opens] + quoted_keys[opens] + "[\n"
+            structure_lines[emitted_closes] = indents[emitted_closes] + "],\n"
+            structures.append(
+                (opens, depth, (indents, emitted_closes, final_depth, structure_lines))
+            )
+
+        lines = structure_lines.copy()
+        lines[entries] = (
+            indents[entries]
+            + quoted_keys[entries]
+            + "'"
+            + _unquote_php_values(values[entries])
+            + "',\n"
+        )
+        texts.append("".join(lines.tolist()))
+        new_depths.append(final_depth)
+    return texts, new_depths
+
+
+def iter_php_chunks(sheet, key_column, value_column, chunk_rows=CHUNK_ROWS):
+    """
+    Render an Excel sheet as a PHP array file, a block of rows at a time.
+
+    A row whose value is "[" opens a nested array and a row whose key is "]"
+    closes the innermost one. Only one block of rows is converted to text at a
+    time, so the whole PHP source is never held in memory.
+
+    Args:
+        sheet (pandas.DataFrame | StreamingSheet): The Excel sheet to process.
+        key_column (str): The column name to use as keys in the PHP array.
+        value_column (str): The column name to use as values in the PHP array.
+        chunk_rows (int): Number of rows rendered at a time.
+
+    Yields:
+        str: Consecutive chunks of the PHP source.
+    """
+    for chunks in iter_php_chunk_columns(sheet, key_column, [value_column], chunk_rows):
+        yield chunks[0]
+
+
+def iter_php_chunk_columns(sheet, key_column, value_columns, chunk_rows=CHUNK_ROWS):
+    """
+    Render one PHP array file per value column of an Excel sheet, in a single pass.
+
+    Same as `iter_php_chunks` for every value column, but the sheet is read once and
+    the keys and the nesting structure are worked out once for all columns.
+
+    Args:
+        sheet (pandas.DataFrame | StreamingSheet): The Excel sheet to process.
+        key_column (str): The column name to use as keys in the PHP arrays.
+        value_columns (list): The column names to use as values, one file each.
+        chunk_rows (int): Number of rows rendered at a time.
+
+    Yields:
+        list: Consecutive chunks of the PHP source of every value column.
+    """
+    if isinstance(sheet, StreamingSheet):
+        yield from iter_php_line_columns(
+            sheet.iter_columns(key_column, value_columns), len(value_columns), chunk_rows
+        )
+        return
+
+    yield [PHP_HEADER] * len(value_columns)
+    depths = [0] * len(value_columns)
+    for start in range(0, len(sheet), chunk_rows):
+        block = sheet.iloc[start : start + chunk_rows]
+        texts, depths = _php_chunks(
+            _text_column(block, key_column),
+            [_text_column(block, column) for column in value_columns],
+            depths,
+        )
+        yield texts
+    yield [
+        "".join(close_line(level) for level in range(depth - 1, -1, -1)) + PHP_FOOTER
+        for depth in depths
+    ]
+
+
+def sheet_to_php(sheet, key_column, value_column):
+    """
+    Render an Excel sheet as the body of a PHP array file.
+
+    Args:
+        sheet (pandas.DataFrame | StreamingSheet): The Excel sheet to process.
+        key_column (str): The column name to use as keys in the PHP array.
+        value_column (str): The column name to use as values in the PHP array.
+
+    Returns:
+        str: The complete PHP source.
+    """
+    return "".join(iter_php_chunks(sheet, key_column, value_column))
@@ -0,0 +1,168 @@
+from sheet_cache import load_sheet
+
+FULL_READ = "Full (load the whole sheet with pandas)"
+STREAMING_READ = "Streaming (read-only, only the selected columns)"
+READ_MODES = [FULL_READ, STREAMING_READ]
+
+
+def cell_text(cell):
+    """
+    Turn a cell value into the string both read modes work with.
+
+    Empty cells become "nan", as they do when pandas reads them, and whole
+    numbers stored as floats lose their ".0". pandas turns an integer column
+    with blanks into floats while openpyxl keeps the integers, so without this
+    the same workbook would give "1.0" in full mode and "1" in streaming mode.
+
+    Args:
+        cell: The cell value, as read by pandas or openpyxl.
+
+    Returns:
+        str: The cell as text.
+    """
+    if cell is None:
+        return "nan"
+    if isinstance(cell, float) and cell.is_integer():
+        return str(int(cell))
+    return str(cell)
+
+
+def open_workbook(workbook_path):
+    """
+    Open a workbook in read-only mode for streaming.
+
+    The workbook (and its shared strings) is loaded once; list its sheets with
+    `sheetnames` and pass it to `open_sheet` to stream one of them.
+
+    Args:
+        workbook_path (str): Path to the Excel workbook.
+
+    Returns:
+        openpyxl.Workbook: The read-only workbook.
+    """
+    from openpyxl import load_workbook
+
+    return load_workbook(workbook_path, read_only=True, data_only=True)
+
+
+def list_sheet_names(workbook_path):
+    """
+    List the sheet names of a workbook without loading any cells.
+
+    Args:
+        workbook_path (str): Path to the Excel workbook.
+
+    Returns:
+        list: Sheet names in workbook order.
+    """
+    workbook = open_workbook(workbook_path)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+class StreamingSheet:
+    """
+    An Excel sheet read lazily, row by row, with openpyxl in read-only mode.
+
+    Only the header row is read up front. Rows are streamed by `iter_rows` so
+    that peak memory does not depend on the size of the sheet. The worksheet
+    comes from a workbook opened once with `open_workbook`, so reading the
+    header and the rows does not load the workbook again.
+    """
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.sheet_name = worksheet.title
+        self.columns = self._read_header()
+
+    def close(self):
+        """Close the workbook the sheet belongs to."""
+        self.worksheet.parent.close()
+
+    def _read_header(self):
+        """
+        Read the header row and name the columns the same way pandas does.
+
+        Returns:
+            list: Column names, with "Unnamed: N" for empty headers and ".N"
+            suffixes for duplicates.
+        """
+        header = next(self.worksheet.iter_rows(max_row=1, values_only=True), ())
+
+        columns = []
+        seen = {}
+        for index, name in enumerate(header):
+            if name is None:
+                name = f"Unnamed: {index}"
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            columns.append(name)
+        return columns
+
+    def iter_rows(self, key_column, value_column):
+        """
+        Stream the key and value cells of every data row.
+
+        Args:
+            key_column (str): The column name to use as keys.
+            value_column (str): The column name to use as values.
+
+        Yields:
+            tuple: (key, value) cell strings, as turned into text by `cell_text`.
+        """
+        for key, (value,) in self.iter_columns(key_column, [value_column]):
+            yield key, value
+
+    def iter_columns(self, key_column, value_columns):
+        """
+        Stream the key cell and several value cells of every data row.
+
+        Args:
+            key_column (str): The column name to use as keys.
+            value_columns (list): The column names to use as values.
+
+        Yields:
+            tuple: (key, values) with the key cell string and a tuple of the value
+            cell strings, as turned into text by `cell_text`.
+        """
+        indexes = [self.columns.index(column) for column in (key_column, *value_columns)]
+        first = min(indexes)
+        last = max(indexes)
+        offsets = [index - first for index in indexes]
+
+        for row in self.worksheet.iter_rows(
+            min_row=2, min_col=first + 1, max_col=last + 1, values_only=True
+        ):
+            row = row + (None,) * (last - first + 1 - len(row))
+            cells = [cell_text(row[offset]) for offset in offsets]
+            yield cells[0], tuple(cells[1:])
+
+
+def open_sheet(
+    workbook_path, sheet_name, read_mode=FULL_READ, excel_file=None, use_cache=True
+):
+    """
+    Open a sheet either fully with pandas or as a `StreamingSheet`.
+
+    Args:
+        workbook_path (str): Path to the Excel workbook.
+        sheet_name (str): Name of the sheet to open.
+        read_mode (str): One of `READ_MODES`.
+        excel_file (pandas.ExcelFile | openpyxl.Workbook): Already opened workbook,
+            if any: a `pandas.ExcelFile` for full reads, or the workbook returned by
+            `open_workbook` for streaming reads.
+        use_cache (bool): Whether a full read may use the parsed-sheet cache.
+
+    Returns:
+        pandas.DataFrame | StreamingSheet: The opened sheet.
+    """
+    if read_mode == STREAMING_READ:
+        workbook = excel_file if excel_file is not None else open_workbook(workbook_path)
+        return StreamingSheet(workbook[sheet_name])
+
+    return load_sheet(workbook_path, sheet_name, excel_file=excel_file, use_cache=use_cache)
@@ -0,0 +1,30 @@
+from typing import List
+
+## formatting
+BOLD = "\033[1m"
+ITALIC = "\033[3m"
+RESET = "\033[0m"
+
+
+def inquire(message: str, choices: List) -> str:
+    """
+    Prompt the user with a list of choices and return the selected choice.
+    Args:
+        message (str): The message to display to the user.
+        choices (list): A list of choices for the user to select from.
+    Returns:
+        str: The choice selected by the user.
+    """
+    # inquirer is slow to import and only needed for interactive runs
+    import inquirer
+
+    questions = [
+        inquirer.List(
+            "choice",
+            message=message + " (use ↓ ↑ to navigate)",
+            choices=choices,
+        )
+    ]
+
+    answer = inquirer.prompt(questions)
+    return answer["choice"]
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from php_parser import parse_php_content
+from php_shards import ROOT_SHARD, read_shard_index, write_php_shards
+
+
+class WritePhpShardsTest(unittest.TestCase):
+    def test_lines_without_a_single_arrow_are_kept(self):
+        php = (
+            "<?php\n$messages = [\n"
+            "    'a' => 'x => y',\n"
+            "    'foo',\n"
+            "    'g' => [\n"
+            "        'b' => 'c => d',\n"
+            "        'c' => 'd',\n"
+            "    ],\n"
+            "];"
+        )
+        with tempfile.TemporaryDirectory() as output_dir:
+            counts = write_php_shards(output_dir, [php], 1)
+            self.assertEqual(counts["shards"], 1)
+
+            self.assertEqual(read_shard_index(output_dir), {ROOT_SHARD + ".php", "g.php"})
+            with open(os.path.join(output_dir, "g.php"), encoding="utf-8") as f:
+                shard = f.read()
+            with open(os.path.join(output_dir, ROOT_SHARD + ".php"), encoding="utf-8") as f:
+                root = f.read()
+
+        self.assertIn("'a' => 'x => y',", root)
+        self.assertIn("'foo',", root)
+        self.assertIn("'b' => 'c => d',", shard)
+        self.assertEqual(parse_php_content(shard), {"c": "d"})
+
+
+if __name__ == "__main__":
+    unittest.main()
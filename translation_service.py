@@ -0,0 +1,516 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import excel_to_php_converter
+import key_value_mapper
+from compare_state import file_hash
+from diff_report import REPORT_FORMATS, TEXT_REPORT
+from output_formats import PHP_FORMAT
+from progress import QUIET, VERBOSE, set_verbosity
+from sheet_engine import sheet_to_mapping
+from sheet_reader import FULL_READ, open_sheet
+from watcher import file_version
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_MEMORY_BYTES = 1024 * 1024 * 1024
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+def estimate_size(value):
+    """
+    Rough number of bytes held by a parsed sheet, mapping or PHP index.
+
+    Args:
+        value: A pandas.DataFrame, or dictionaries, tuples and lists of strings and numbers
+
+    Returns:
+        int: Estimated size in bytes
+    """
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum())
+    size = 0
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (tuple, list)):
+            pending.extend(item)
+    return size
+
+
+class ParsedFileCache:
+    """
+    Memory-bounded LRU cache of what was parsed from input files.
+
+    Every entry belongs to one file and remembers the version (modification time
+    and size) and the contents hash the file had when it was parsed. An entry is
+    used as long as the version is unchanged. When only the modification time
+    changed (a file saved or checked out again with the same contents), the hash
+    decides and the entry is kept if the contents are the same.
+    """
+
+    def __init__(self, max_bytes=MAX_MEMORY_BYTES):
+        """
+        Args:
+            max_bytes (int): Estimated memory the entries may hold together
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # keys being loaded, mapped to an event set when the load is over
+        self._loading = {}
+        self._lock = threading.RLock()
+
+    def get(self, path, key, load):
+        """
+        Return the cached result of `load` for a file, loading it when missing or stale.
+
+        The file is hashed and parsed without holding the lock, so lookups of other
+        entries are not held up. Concurrent calls for the same entry wait for the
+        first one instead of parsing the file again.
+
+        Args:
+            path (str): The file the result is parsed from
+            key (tuple): Identifies what is parsed from the file (kind and options)
+            load (callable): Parses the file, called without arguments
+
+        Returns:
+            The result of `load`
+        """
+        path = os.path.abspath(path)
+        key = (path, *key)
+        while True:
+            with self._lock:
+                version = file_version(path)
+                if version is None:
+                    raise FileNotFoundError(f"No such file: {path}")
+                entry = self._entries.get(key)
+                if entry is not None and entry["version"] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry["value"]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    break
+            loading.wait()
+
+        try:
+            # the version is taken before hashing and parsing, so a save meanwhile is seen
+            digest = file_hash(path)
+            if entry is not None and (entry["version"][1], entry["digest"]) == (version[1], digest):
+                # only the modification time changed
+                with self._lock:
+                    entry["version"] = version
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    self.hits += 1
+                return entry["value"]
+
+            value = load()
+            size = estimate_size(value)
+            with self._lock:
+                self.misses += 1
+                if key in self._entries:
+                    self._remove(key)
+                if size <= self.max_bytes:
+                    self._entries[key] = {
+                        "version": version,
+                        "digest": digest,
+                        "value": value,
+                        "size": size,
+                    }
+                    self.size += size
+                    while self.size > self.max_bytes:
+                        self._remove(next(iter(self._entries)))
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Entry count, estimated size, limit, hits and misses of the cache
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        """
+        Returns:
+            int: Number of removed entries
+        """
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self.size = 0
+            return removed
+
+    def _remove(self, key):
+        self.size -= self._entries.pop(key)["size"]
+
+
+class TranslationService:
+    """
+    Runs compare, convert and lookup requests against parsed files kept in memory.
+
+    Sheets are read with pandas, sheet mappings and PHP indexes are built once and
+    all of them are kept in a `ParsedFileCache`, so repeated requests on unchanged
+    files skip reading and parsing altogether. Compare and convert requests write
+    their outputs relative to the working directory of the service and run one at a
+    time. Lookups only read the cache and run concurrently with them.
+    """
+
+    def __init__(self, max_bytes=MAX_MEMORY_BYTES, use_cache=True):
+        """
+        Args:
+            max_bytes (int): Estimated memory the parsed files may hold together
+            use_cache (bool): Whether a sheet missing from memory may be loaded from
+                the parsed-sheet cache on disk
+        """
+        self.cache = ParsedFileCache(max_bytes)
+        self.use_cache = use_cache
+        self._job_lock = threading.Lock()
+
+    def sheet(self, workbook, sheet_name):
+        """
+        Returns:
+            pandas.DataFrame: The parsed sheet of a workbook
+        """
+        return self.cache.get(
+            workbook,
+            ("sheet", sheet_name),
+            lambda: open_sheet(workbook, sheet_name, FULL_READ, use_cache=self.use_cache),
+        )
+
+    def sheet_mapping(self, workbook, sheet_name, key_column, value_column):
+        """
+        Returns:
+            dict: The key-value mapping of a sheet, see `sheet_engine.sheet_to_mapping`
+        """
+        return self.cache.get(
+            workbook,
+            ("mapping", sheet_name, key_column, value_column),
+            lambda: sheet_to_mapping(
+                self.sheet(workbook, sheet_name), key_column, value_column
+            ),
+        )
+
+    def php_index(self, php_file, mmap_scan=False):
+        """
+        Returns:
+            tuple: (php_data, php_spans) of a PHP file, see `key_value_mapper.index_php_file`
+        """
+        return self.cache.get(
+            php_file,
+            ("php_index", mmap_scan),
+            lambda: key_value_mapper.index_php_file(php_file, mmap_scan),
+        )
+
+    def compare(self, request):
+        """
+        Compare a sheet with a PHP file and write the reports.
+
+        Args:
+            request (dict): "workbook", "sheet", "key_column", "value_column" and "php",
+                plus the optional "incremental", "report_format", "text_exports",
+                "mmap", "output_workers", "shard_depth" and "renames" (detect_renames)
+                of `key_value_mapper.process_file`
+
+        Returns:
+            dict: The summary of the run
+        """
+        workbook, sheet_name, key_column, value_column = _sheet_fields(request)
+        php_file = _field(request, "php")
+        report_format = request.get("report_format", TEXT_REPORT)
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report_format {report_format!r}")
+        text_exports = request.get("text_exports")
+        mmap_scan = bool(request.get("mmap", False))
+
+        sheet = self.sheet(workbook, sheet_name)
+        _check_columns(sheet, sheet_name, [key_column, value_column])
+        excel_data = self.sheet_mapping(workbook, sheet_name, key_column, value_column)
+        php_index = self.php_index(php_file, mmap_scan)
+        return key_value_mapper.process_file(
+            sheet,
+            key_column,
+            value_column,
+            php_file,
+            excel_file_name=workbook,
+            sheet_name=sheet_name,
+            incremental=bool(request.get("incremental", False)),
+            report_format=report_format,
+            text_exports=None if text_exports is None else tuple(text_exports),
+            excel_data=excel_data,
+            php_index=php_index,
+            mmap_scan=mmap_scan,
+            output_workers=request.get("output_workers"),
+            shard_depth=request.get("shard_depth"),
+            detect_renames=bool(request.get("renames", False)),
+        )
+
+    def convert(self, request):
+        """
+        Convert a sheet to PHP files.
+
+        Args:
+            request (dict): "workbook", "sheet", "key_column" and either "value_column"
+                with an optional "output" name, or "value_columns" (a list, or "all"
+                for every column except the key) with optional "outputs" names, and
+                the optional "shard_depth" and "format" of
+                `excel_to_php_converter.process_file`
+
+        Returns:
+            dict: "files", the paths of the written PHP files
+        """
+        workbook = _field(request, "workbook")
+        sheet_name = _field(request, "sheet")
+        key_column = _field(request, "key_column")
+        sheet = self.sheet(workbook, sheet_name)
+
+        if "value_columns" not in request:
+            value_column = _field(request, "value_column")
+            _check_columns(sheet, sheet_name, [key_column, value_column])
+            output_file = excel_to_php_converter.process_file(
+                sheet,
+                key_column,
+                value_column,
+                request.get("output", sheet_name),
+                shard_depth=request.get("shard_depth"),
+                output_format=request.get("format", PHP_FORMAT),
+            )
+            files = None if output_file is None else [output_file]
+        else:
+            value_columns = request["value_columns"]
+            if value_columns == "all":
+                value_columns = [column for column in sheet.columns if column != key_column]
+            _check_columns(sheet, sheet_name, [key_column, *value_columns])
+            files = excel_to_php_converter.process_columns(
+                sheet,
+                key_column,
+                value_columns,
+                request.get("outputs"),
+                shard_depth=request.get("shard_depth"),
+                output_format=request.get("format", PHP_FORMAT),
+            )
+        if files is None:
+            raise RuntimeError("Could not write the PHP files")
+        return {"files": files}
+
+    def lookup(self, request):
+        """
+        Look up the values of keys in a PHP file, or in a sheet.
+
+        Args:
+            request (dict): "keys" and either "php" (with an optional "mmap"), or
+                "workbook", "sheet", "key_column" and "value_column"
+
+        Returns:
+            dict: "values", mapping every key to its value, or None when missing
+        """
+        keys = _field(request, "keys")
+        if "php" in request:
+            data = self.php_index(request["php"], bool(request.get("mmap", False)))[0]
+        else:
+            workbook, sheet_name, key_column, value_column = _sheet_fields(request)
+            _check_columns(self.sheet(workbook, sheet_name), sheet_name, [key_column, value_column])
+            data = self.sheet_mapping(workbook, sheet_name, key_column, value_column)
+        return {"values": {key: data.get(key) for key in keys}}
+
+    def run(self, command, request):
+        """
+        Run a command, capturing what it prints when it writes outputs.
+
+        Args:
+            command (str): "compare", "convert" or "lookup"
+            request (dict): The parameters of the command
+
+        Returns:
+            dict: The result of the command with the "seconds" it took and, for
+            compare and convert, its "log"
+        """
+        started = time.perf_counter()
+        if command == "lookup":
+            result = self.lookup(request)
+        else:
+            run = self.compare if command == "compare" else self.convert
+            log = io.StringIO()
+            # outputs and stdout are shared, so writing commands run one at a time
+            with self._job_lock, contextlib.redirect_stdout(log):
+                result = run(request)
+            result = dict(result, log=log.getvalue())
+        result["seconds"] = round(time.perf_counter() - started, 4)
+        return result
+
+
+def _field(request, name):
+    if name not in request:
+        raise ValueError(f"Missing field {name!r}")
+    return request[name]
+
+
+def _sheet_fields(request):
+    return tuple(
+        _field(request, name) for name in ("workbook", "sheet", "key_column", "value_column")
+    )
+
+
+def _check_columns(sheet, sheet_name, columns):
+    for column in columns:
+        if column not in sheet.columns:
+            raise ValueError(
+                f"Sheet '{sheet_name}' has no column {column!r}, it has {list(sheet.columns)}"
+            )
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP: POST /compare, /convert and /lookup with a JSON object body,
+    GET /stats for the cache statistics and POST /clear to empty the cache.
+    """
+
+    service = None
+    commands = ("compare", "convert", "lookup")
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(HTTPStatus.OK, self.service.cache.stats())
+        else:
+            self._reply(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        command = self.path.strip("/")
+        if command == "clear":
+            self._reply(HTTPStatus.OK, {"removed": self.service.cache.clear()})
+            return
+        if command not in self.commands:
+            self._reply(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_REQUEST_BYTES:
+                raise ValueError("Request body too large")
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+            result = self.service.run(command, request)
+        except (ValueError, TypeError) as e:
+            self._reply(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except FileNotFoundError as e:
+            self._reply(HTTPStatus.NOT_FOUND, {"error": str(e)})
+        except Exception as e:
+            self._reply(
+                HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+            )
+        else:
+            self._reply(HTTPStatus.OK, result)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "local"
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}", file=sys.stderr)
+
+    def _reply(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, port=DEFAULT_PORT, socket_path=None):
+    """
+    Create the HTTP server of a service, listening on localhost or a Unix socket.
+
+    Args:
+        service (TranslationService): The service answering the requests
+        port (int): TCP port on 127.0.0.1, 0 for any free port
+        socket_path (str): Listen on this Unix socket instead of a TCP port
+
+    Returns:
+        socketserver.BaseServer: The server, not serving yet
+    """
+    handler = type("RequestHandler", (_RequestHandler,), {"service": service})
+    if socket_path is None:
+        return ThreadingHTTPServer((HOST, port), handler)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(socket_path)
+    return _UnixHTTPServer(socket_path, handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve compare, convert and lookup requests with parsed files kept in memory."
+    )
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help=f"port on {HOST} (default: {DEFAULT_PORT})"
+    )
+    parser.add_argument("--socket", help="listen on this Unix socket instead of a port")
+    parser.add_argument(
+        "--max-memory-mb",
+        type=int,
+        default=MAX_MEMORY_BYTES // (1024 * 1024),
+        help="estimated memory the parsed files may hold (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="do not use the parsed-sheet cache on disk"
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="log progress and per-key details of every request (quiet by default)",
+    )
+    args = parser.parse_args(argv)
+
+    set_verbosity(VERBOSE if args.verbose else QUIET)
+    service = TranslationService(args.max_memory_mb * 1024 * 1024, use_cache=not args.no_cache)
+    server = make_server(service, args.port, args.socket)
+    where = args.socket or f"http://{HOST}:{server.server_address[1]}"
+    print(f"Serving on {where} (press Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped serving")
+    finally:
+        server.server_close()
+        if args.socket:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
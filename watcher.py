@@ -0,0 +1,183 @@
+import os
+import time
+from datetime import datetime
+
+import excel_to_php_converter
+import key_value_mapper
+from sheet_engine import sheet_to_mapping
+from sheet_reader import FULL_READ, open_sheet
+from terminal import BOLD, ITALIC, RESET
+
+COMPARE = "compare"
+CONVERT = "convert"
+POLL_SECONDS = 0.25
+
+
+def file_version(path):
+    """
+    Cheap fingerprint of a file, changing whenever the file is saved.
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        tuple: (mtime_ns, size), or None while the file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Watcher:
+    """
+    Keep the outputs of a conversion or comparison up to date with its input files.
+
+    The parsed sheet, its key-value mapping and the PHP index are kept in memory
+    and only parsed again when their own file changes. A comparison runs in
+    incremental mode, so only the outputs affected by a change are written again.
+    """
+
+    def __init__(
+        self,
+        workbook_path,
+        sheet_name,
+        key_column,
+        value_column,
+        php_file_path=None,
+        mode=COMPARE,
+        read_mode=FULL_READ,
+        use_cache=True,
+        **compare_options,
+    ):
+        """
+        Args:
+            workbook_path (str): Excel workbook to watch
+            sheet_name (str): Sheet to read
+            key_column (str): The column name to use as keys
+            value_column (str): The column name to use as values
+            php_file_path (str): PHP file to compare against (compare mode), or the
+                output file name without ".php" (convert mode)
+            mode (str): COMPARE or CONVERT
+            read_mode (str): How the workbook is read, one of `sheet_reader.READ_MODES`
+            use_cache (bool): Whether the parsed-sheet cache may be used
+            compare_options: Extra keyword arguments for `key_value_mapper.process_file`
+        """
+        self.workbook_path = workbook_path
+        self.sheet_name = sheet_name
+        self.key_column = key_column
+        self.value_column = value_column
+        self.php_file_path = php_file_path
+        self.mode = mode
+        self.read_mode = read_mode
+        self.use_cache = use_cache
+        self.compare_options = compare_options
+
+        self.sheet = None
+        self.excel_data = None
+        self.php_index = None
+        self.versions = {}
+
+    def watched_files(self):
+        """
+        Returns:
+            list: The input files of the conversion or comparison
+        """
+        if self.mode == COMPARE:
+            return [self.workbook_path, self.php_file_path]
+        return [self.workbook_path]
+
+    def refresh(self, changed):
+        """
+        Parse the changed files again and regenerate the outputs.
+
+        Args:
+            changed (list): Files that changed since the last refresh
+        """
+        if self.workbook_path in changed or self.sheet is None:
+            self.sheet = open_sheet(
+                self.workbook_path,
+                self.sheet_name,
+                self.read_mode,
+                use_cache=self.use_cache,
+            )
+            self.excel_data = None
+
+        if self.mode == CONVERT:
+            excel_to_php_converter.process_file(
+                self.sheet, self.key_column, self.value_column, self.php_file_path
+            )
+        else:
+            if self.excel_data is None:
+                self.excel_data = sheet_to_mapping(
+                    self.sheet, self.key_column, self.value_column
+                )
+            if self.php_file_path in changed or self.php_index is None:
+                self.php_index = key_value_mapper.index_php_file(
+                    self.php_file_path,
+                    self.compare_options.get("mmap_scan", False),
+                    self.compare_options.get("parse_workers"),
+                )
+
+            key_value_mapper.process_file(
+                self.sheet,
+                self.key_column,
+                self.value_column,
+                self.php_file_path,
+                excel_file_name=self.workbook_path,
+                sheet_name=self.sheet_name,
+                incremental=True,
+                excel_data=self.excel_data,
+                php_index=self.php_index,
+                **self.compare_options,
+            )
+
+    def run(self, poll_seconds=POLL_SECONDS, max_refreshes=None):
+        """
+        Poll the input files and refresh the outputs whenever one of them is saved.
+
+        A change is only processed once the file has stopped changing for one poll,
+        so that a save in progress is not read half-written. If a refresh fails (e.g.
+        the workbook was still locked), it is tried again on the next save.
+
+        Args:
+            poll_seconds (float): Time between two polls
+            max_refreshes (int): Stop after this many refreshes, never by default
+        """
+        print(
+            f"Watching {ITALIC}{', '.join(self.watched_files())}{RESET} "
+            f"(press Ctrl+C to stop)"
+        )
+        refreshes = 0
+        pending = {}
+        try:
+            while max_refreshes is None or refreshes < max_refreshes:
+                current = {path: file_version(path) for path in self.watched_files()}
+                changed = [
+                    path
+                    for path, version in current.items()
+                    if version != self.versions.get(path)
+                ]
+                settled = changed and all(
+                    current[path] is not None and pending.get(path) == current[path]
+                    for path in changed
+                )
+                pending = current
+
+                if settled:
+                    stamp = datetime.now().strftime("%H:%M:%S")
+                    print(f"\n[{stamp}] {BOLD}Changed{RESET}: {', '.join(changed)}")
+                    started = time.perf_counter()
+                    try:
+                        self.refresh(changed)
+                    except Exception as e:
+                        print(f"Could not refresh, waiting for the next save: {e}")
+                    else:
+                        print(f"Refreshed in {time.perf_counter() - started:.2f}s")
+                    # a failed refresh is not retried until the file is saved again
+                    self.versions.update((path, current[path]) for path in changed)
+                    refreshes += 1
+                time.sleep(poll_seconds)
+        except KeyboardInterrupt:
+            print("\nStopped watching")